@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import datetime as dt
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from .models import Option, Poll
+
+
+_MISSING = object()
+
+
+class LRUCache:
+	"""Thread-safe LRU cache with an optional per-entry TTL and hit/miss counters."""
+
+	def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None) -> None:
+		self.maxsize = maxsize
+		self.ttl = ttl
+		self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def __len__(self) -> int:
+		return len(self._data)
+
+	def get(self, key: Hashable, default: Any = None) -> Any:
+		now = time.monotonic()
+		with self._lock:
+			entry = self._data.get(key, _MISSING)
+			if entry is _MISSING or (entry[0] and entry[0] < now):
+				if entry is not _MISSING:
+					del self._data[key]
+				self.misses += 1
+				return default
+			self._data.move_to_end(key)
+			self.hits += 1
+			return entry[1]
+
+	def set(self, key: Hashable, value: Any) -> None:
+		expires = time.monotonic() + self.ttl if self.ttl else 0.0
+		with self._lock:
+			self._data[key] = (expires, value)
+			self._data.move_to_end(key)
+			while len(self._data) > self.maxsize:
+				self._data.popitem(last=False)
+				self.evictions += 1
+
+	def invalidate(self, key: Hashable) -> bool:
+		with self._lock:
+			return self._data.pop(key, _MISSING) is not _MISSING
+
+	def clear(self) -> None:
+		with self._lock:
+			self._data.clear()
+
+	def stats(self) -> Dict[str, Any]:
+		lookups = self.hits + self.misses
+		return {
+			"size": len(self._data),
+			"maxsize": self.maxsize,
+			"hits": self.hits,
+			"misses": self.misses,
+			"evictions": self.evictions,
+			"hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+		}
+
+
+@dataclass(frozen=True, slots=True)
+class OptionSnapshot:
+	id: int
+	text: str
+
+
+@dataclass(frozen=True, slots=True)
+class PollSnapshot:
+	"""Immutable view of a poll and its options, safe to share between requests."""
+
+	id: int
+	code: str
+	question: str
+	locale: Optional[str]
+	created_at: dt.datetime
+	options: Tuple[OptionSnapshot, ...]
+
+	def has_option(self, option_id: int) -> bool:
+		return any(o.id == option_id for o in self.options)
+
+
+def load_poll_snapshot(session: Session, code: str) -> Optional[PollSnapshot]:
+	poll = session.exec(select(Poll).where(Poll.code == code)).first()
+	if poll is None:
+		return None
+	options = session.exec(select(Option.id, Option.text).where(Option.poll_id == poll.id).order_by(Option.id)).all()
+	return PollSnapshot(
+		id=poll.id,
+		code=poll.code,
+		question=poll.question,
+		locale=poll.locale,
+		created_at=poll.created_at,
+		options=tuple(OptionSnapshot(oid, text) for oid, text in options),
+	)
+
+
+class PollCache:
+	"""Bounded LRU/TTL cache of ``PollSnapshot`` keyed by short code.
+
+	Polls and options are immutable after creation, so entries only need to be
+	dropped through ``invalidate`` once polls become editable or deletable.
+	Unknown codes are not cached, so a poll is visible as soon as it is created.
+	"""
+
+	def __init__(self, maxsize: int = 10000, ttl: Optional[float] = 600) -> None:
+		self._entries = LRUCache(maxsize=maxsize, ttl=ttl)
+		self._codes_by_id: Dict[int, str] = {}
+
+	def get(self, session: Session, code: str) -> Optional[PollSnapshot]:
+		snapshot = self._entries.get(code)
+		if snapshot is None:
+			snapshot = load_poll_snapshot(session, code)
+			if snapshot is not None:
+				self._entries.set(code, snapshot)
+				self._codes_by_id[snapshot.id] = code
+				if len(self._codes_by_id) > 2 * self._entries.maxsize:
+					self._codes_by_id.clear()
+		return snapshot
+
+	def get_by_id(self, session: Session, poll_id: int) -> Optional[PollSnapshot]:
+		code = self._codes_by_id.get(poll_id)
+		if code is None:
+			code = session.exec(select(Poll.code).where(Poll.id == poll_id)).first()
+			if code is None:
+				return None
+		return self.get(session, code)
+
+	def invalidate(self, code: str) -> None:
+		"""Drop a poll's snapshot; call after editing or deleting the poll or its options."""
+		self._entries.invalidate(code)
+
+	def clear(self) -> None:
+		self._entries.clear()
+		self._codes_by_id.clear()
+
+	def stats(self) -> Dict[str, Any]:
+		return self._entries.stats()
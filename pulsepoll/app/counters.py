@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import argparse
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, update
+from sqlmodel import Session, select
+
+from .models import OptionCount, ResultsVersion, Vote
+
+
+def dialect_insert(session: Session):
+	"""The ``insert`` construct with ``ON CONFLICT`` support for the session's database, or None."""
+	name = session.get_bind().dialect.name
+	if name == "sqlite":
+		from sqlalchemy.dialects.sqlite import insert
+	elif name == "postgresql":
+		from sqlalchemy.dialects.postgresql import insert
+	else:
+		return None
+	return insert
+
+
+def get_counts(session: Session, poll_id: int) -> Dict[int, int]:
+	"""Return ``{option_id: count}`` for a poll from the materialized counters."""
+	rows = session.exec(select(OptionCount.option_id, OptionCount.count).where(OptionCount.poll_id == poll_id)).all()
+	return {option_id: count for option_id, count in rows}
+
+
+def get_version(session: Session, poll_id: int) -> int:
+	"""Current results version of a poll (0 before its first vote)."""
+	return session.exec(select(ResultsVersion.version).where(ResultsVersion.poll_id == poll_id)).first() or 0
+
+
+def bump_versions(session: Session, poll_ids: Iterable[int]) -> None:
+	"""Advance the results version of each poll inside the caller's transaction."""
+	upsert = dialect_insert(session)
+	for poll_id in set(poll_ids):
+		if upsert is not None:
+			session.exec(
+				upsert(ResultsVersion)
+				.values(poll_id=poll_id, version=1)
+				.on_conflict_do_update(index_elements=[ResultsVersion.poll_id], set_={"version": ResultsVersion.version + 1})
+			)
+			continue
+		result = session.exec(
+			update(ResultsVersion).where(ResultsVersion.poll_id == poll_id).values(version=ResultsVersion.version + 1)
+		)
+		if result.rowcount == 0:
+			session.exec(insert(ResultsVersion).values(poll_id=poll_id, version=1))
+
+
+def _bump(session: Session, poll_id: int, option_id: int, delta: int) -> None:
+	upsert = dialect_insert(session)
+	if upsert is not None:
+		# one statement, so concurrent first votes for an option cannot both try to insert its row
+		session.exec(
+			upsert(OptionCount)
+			.values(poll_id=poll_id, option_id=option_id, count=max(delta, 0))
+			.on_conflict_do_update(
+				index_elements=[OptionCount.poll_id, OptionCount.option_id],
+				set_={"count": OptionCount.count + delta},
+			)
+		)
+		return
+	result = session.exec(
+		update(OptionCount)
+		.where(OptionCount.poll_id == poll_id, OptionCount.option_id == option_id)
+		.values(count=OptionCount.count + delta)
+	)
+	if result.rowcount == 0:
+		session.exec(insert(OptionCount).values(poll_id=poll_id, option_id=option_id, count=max(delta, 0)))
+
+
+def record_vote(session: Session, poll_id: int, option_id: int, previous_option_id: Optional[int] = None) -> None:
+	"""Apply a new or changed vote to the counters inside the caller's transaction."""
+	if previous_option_id == option_id:
+		return
+	if previous_option_id is not None:
+		_bump(session, poll_id, previous_option_id, -1)
+	_bump(session, poll_id, option_id, 1)
+	bump_versions(session, [poll_id])
+
+
+def apply_deltas(session: Session, deltas: Dict[Tuple[int, int], int]) -> None:
+	"""Apply net ``{(poll_id, option_id): delta}`` changes, one statement per touched option."""
+	for (poll_id, option_id), delta in deltas.items():
+		if delta:
+			_bump(session, poll_id, option_id, delta)
+	bump_versions(session, [poll_id for (poll_id, _), delta in deltas.items() if delta])
+
+
+def _tally_from_votes(session: Session, poll_id: Optional[int] = None) -> Dict[Tuple[int, int], int]:
+	stmt = select(Vote.poll_id, Vote.option_id, func.count(Vote.id)).group_by(Vote.poll_id, Vote.option_id)
+	if poll_id is not None:
+		stmt = stmt.where(Vote.poll_id == poll_id)
+	return {(pid, oid): count for pid, oid, count in session.exec(stmt).all()}
+
+
+def rebuild(session: Session, poll_id: Optional[int] = None) -> int:
+	"""Recompute counters from the ``Vote`` table (all polls, or one) without committing. Returns rows written."""
+	tally = _tally_from_votes(session, poll_id)
+	stmt = delete(OptionCount)
+	if poll_id is not None:
+		stmt = stmt.where(OptionCount.poll_id == poll_id)
+		touched = {poll_id}
+	else:
+		touched = {pid for pid, _ in tally} | set(session.exec(select(OptionCount.poll_id).distinct()).all())
+	session.exec(stmt)
+	bump_versions(session, touched)
+	if tally:
+		session.exec(
+			insert(OptionCount),
+			params=[{"poll_id": pid, "option_id": oid, "count": count} for (pid, oid), count in tally.items()],
+		)
+	return len(tally)
+
+
+def verify(session: Session, poll_id: Optional[int] = None) -> List[Tuple[int, int, int, int]]:
+	"""Compare counters with the ``Vote`` table; returns ``(poll_id, option_id, expected, actual)`` mismatches."""
+	expected = _tally_from_votes(session, poll_id)
+	stmt = select(OptionCount.poll_id, OptionCount.option_id, OptionCount.count)
+	if poll_id is not None:
+		stmt = stmt.where(OptionCount.poll_id == poll_id)
+	actual = {(pid, oid): count for pid, oid, count in session.exec(stmt).all()}
+	mismatches = []
+	for key in sorted(set(expected) | set(actual)):
+		if expected.get(key, 0) != actual.get(key, 0):
+			mismatches.append((key[0], key[1], expected.get(key, 0), actual.get(key, 0)))
+	return mismatches
+
+
+def backfill_if_empty(session: Session) -> bool:
+	"""Populate counters for databases that predate them. Returns True if a rebuild ran."""
+	if session.exec(select(OptionCount.poll_id).limit(1)).first() is not None:
+		return False
+	if session.exec(select(Vote.id).limit(1)).first() is None:
+		return False
+	rebuild(session)
+	session.commit()
+	return True
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+	from .db import engine, init_db
+
+	parser = argparse.ArgumentParser(prog="python -m app.counters", description="Maintain materialized vote counters")
+	parser.add_argument("command", choices=["rebuild", "verify"])
+	parser.add_argument("--poll-id", type=int, default=None)
+	args = parser.parse_args(argv)
+	init_db()
+	with Session(engine) as session:
+		if args.command == "rebuild":
+			written = rebuild(session, args.poll_id)
+			session.commit()
+			print(f"rebuilt {written} counter rows")
+			return 0
+		mismatches = verify(session, args.poll_id)
+		for pid, oid, expected, actual in mismatches:
+			print(f"poll={pid} option={oid} expected={expected} actual={actual}")
+		print("ok" if not mismatches else f"{len(mismatches)} mismatched counters")
+		return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+	raise SystemExit(main())
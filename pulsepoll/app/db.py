@@ -1,28 +1,105 @@
 from __future__ import annotations
 
-from contextlib import contextmanager
-from typing import Iterator
+from typing import AsyncIterator, Dict, Iterator, Optional
 import os
 
+from fastapi import Request
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlmodel import SQLModel, Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import metrics
+from .utils import has_recent_write
 
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./pulsepoll.db")
+# "sync" serves requests from the threadpool; "async" runs the hot read/vote endpoints on the event loop
+DB_MODE = os.environ.get("DB_MODE", "sync")
+# optional read replica for GET endpoints; clients that just wrote read from the primary for this long
+DATABASE_REPLICA_URL = os.environ.get("DATABASE_REPLICA_URL") or None
+READ_YOUR_WRITES_SECONDS = int(os.environ.get("READ_YOUR_WRITES_SECONDS", "10"))
+
+
+def _create_engine(url: str) -> Engine:
+	return create_engine(
+		url,
+		connect_args={"check_same_thread": False} if url.startswith("sqlite") else {},
+		pool_pre_ping=True,
+	)
+
 
-engine = create_engine(
-	DATABASE_URL,
-	connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
-	pool_pre_ping=True,
-)
+engine = _create_engine(DATABASE_URL)
+read_engine = _create_engine(DATABASE_REPLICA_URL) if DATABASE_REPLICA_URL else engine
 
 
 def init_db() -> None:
 	SQLModel.metadata.create_all(engine)
 
 
-@contextmanager
 def get_session() -> Iterator[Session]:
 	session = Session(engine)
 	try:
 		yield session
 	finally:
-		session.close()
\ No newline at end of file
+		session.close()
+
+
+def uses_replica() -> bool:
+	return read_engine is not engine
+
+
+def reads_replica(session: Session) -> bool:
+	"""Whether ``session`` (or the sync session behind an ``AsyncSession``) reads from the replica."""
+	return session.info.get("replica", False)
+
+
+def get_read_session(request: Request) -> Iterator[Session]:
+	"""Session for read-only endpoints: the replica, unless this client wrote within the last few seconds."""
+	replica = uses_replica() and not has_recent_write(request)
+	session = Session(read_engine if replica else engine, info={"replica": replica})
+	try:
+		yield session
+	finally:
+		session.close()
+
+
+_ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg", "postgres": "postgresql+asyncpg"}
+
+_async_engines: Dict[str, AsyncEngine] = {}
+
+
+def async_database_url(url: str) -> str:
+	"""Swap the driver of a sync URL for its asyncio counterpart (aiosqlite / asyncpg)."""
+	scheme, sep, rest = url.partition("://")
+	backend = scheme.split("+", 1)[0]
+	if backend not in _ASYNC_DRIVERS:
+		raise ValueError(f"no async driver for {scheme!r}")
+	return f"{_ASYNC_DRIVERS[backend]}{sep}{rest}"
+
+
+def get_async_engine(url: Optional[str] = None) -> AsyncEngine:
+	"""The async engine for ``url`` (default ``DATABASE_URL``), created on first use so sync deployments never import its driver."""
+	url = url or DATABASE_URL
+	async_engine = _async_engines.get(url)
+	if async_engine is None:
+		async_engine = _async_engines[url] = create_async_engine(async_database_url(url), pool_pre_ping=True)
+		metrics.instrument_engine(async_engine.sync_engine, "primary-async" if url == DATABASE_URL else "replica-async")
+	return async_engine
+
+
+async def dispose_async_engine() -> None:
+	engines = list(_async_engines.values())
+	_async_engines.clear()
+	for async_engine in engines:
+		await async_engine.dispose()
+
+
+async def get_async_session() -> AsyncIterator[AsyncSession]:
+	async with AsyncSession(get_async_engine(), expire_on_commit=False) as session:
+		yield session
+
+
+async def get_async_read_session(request: Request) -> AsyncIterator[AsyncSession]:
+	replica = DATABASE_REPLICA_URL if not has_recent_write(request) else None
+	async with AsyncSession(get_async_engine(replica), expire_on_commit=False, info={"replica": replica is not None}) as session:
+		yield session
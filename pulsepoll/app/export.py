@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+from typing import Iterator
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from .cache import PollSnapshot
+from .models import Vote
+from .utils import hash_voter_id
+
+
+EXPORT_FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+VOTE_EXPORT_COLUMNS = ["vote_id", "option_id", "option_text", "voter_hash", "created_at"]
+
+
+def iter_vote_export(engine: Engine, poll: PollSnapshot, fmt: str, secret: str, chunk_size: int = 1000) -> Iterator[str]:
+	"""Yield a poll's raw votes as CSV or JSONL text, one chunk of rows at a time.
+
+	Rows are read through a server-side cursor (``stream_results`` with
+	``yield_per``), so memory stays flat however many votes the poll has. The
+	generator owns its session, which lives exactly as long as the response body.
+	Voter ids are replaced by ``hash_voter_id`` pseudonyms keyed with ``secret``.
+	"""
+	option_text = {o.id: o.text for o in poll.options}
+	buf = io.StringIO()
+	writer = csv.writer(buf)
+	if fmt == "csv":
+		writer.writerow(VOTE_EXPORT_COLUMNS)
+	stmt = (
+		select(Vote.id, Vote.option_id, Vote.voter_id, Vote.created_at)
+		.where(Vote.poll_id == poll.id)
+		.order_by(Vote.id)
+		.execution_options(stream_results=True, yield_per=chunk_size)
+	)
+	with Session(engine) as session:
+		for vote_id, option_id, voter_id, created_at in session.exec(stmt):
+			row = [vote_id, option_id, option_text.get(option_id, ""), hash_voter_id(voter_id, poll.id, secret), created_at.isoformat()]
+			if fmt == "csv":
+				writer.writerow(row)
+			else:
+				buf.write(json.dumps(dict(zip(VOTE_EXPORT_COLUMNS, row)), ensure_ascii=False))
+				buf.write("\n")
+			if buf.tell() >= 64 * 1024:
+				yield buf.getvalue()
+				buf.seek(0)
+				buf.truncate()
+	if buf.tell():
+		yield buf.getvalue()
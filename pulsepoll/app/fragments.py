@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from .cache import LRUCache
+from .timing import TimedTemplates
+
+
+class FragmentCache:
+	"""Rendered page HTML keyed by ``(template, lang, code, version, url)``.
+
+	Pages are rendered once per key from a context built only on a miss, so a
+	hit costs neither queries nor a Jinja render. ``version`` is whatever
+	changes the page content (the poll id for immutable polls, the trending
+	ids for listings); old versions simply age out of the bounded LRU/TTL.
+	Per-viewer state and the live tally are not part of the page key and are
+	spliced into the cached HTML by the caller (see ``mark_current_vote`` and
+	``fill_results``); ``cached`` holds such smaller per-version pieces.
+	"""
+
+	def __init__(self, templates: TimedTemplates, maxsize: int = 2000, ttl: Optional[float] = 60) -> None:
+		self._templates = templates
+		self._entries = LRUCache(maxsize=maxsize, ttl=ttl)
+
+	def render(
+		self,
+		template: str,
+		lang: str,
+		code: Optional[str],
+		version: Hashable,
+		url: str,
+		context: Callable[[], Dict[str, Any]],
+	) -> str:
+		return self.cached((template, lang, code, version, url), lambda: self._templates.render(template, context()))
+
+	def cached(self, key: Hashable, build: Callable[[], Any]) -> Any:
+		"""Value for ``key``, built on a miss."""
+		value = self._entries.get(key)
+		if value is None:
+			value = build()
+			self._entries.set(key, value)
+		return value
+
+	def clear(self) -> None:
+		self._entries.clear()
+
+	def stats(self) -> Dict[str, Any]:
+		return self._entries.stats()
+
+
+def mark_current_vote(html: str, option_id: int) -> str:
+	"""Check the radio button of ``option_id`` in a cached poll page."""
+	radio = f'name="option_id" value="{option_id}"'
+	return html.replace(radio, radio + " checked", 1)
+
+
+# where poll and embed pages take the tally, which changes with every vote
+RESULTS_ROWS = "<!-- results -->"
+RESULTS_STATE = "<!-- results-state -->"
+
+
+def fill_results(html: str, slots: Tuple[str, str]) -> str:
+	"""Put results rows and their JSON state (see ``RESULTS_ROWS``/``RESULTS_STATE``) into a cached page."""
+	rows, state = slots
+	return html.replace(RESULTS_ROWS, rows, 1).replace(RESULTS_STATE, state, 1)
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from . import votes
+
+
+logger = logging.getLogger(__name__)
+
+PendingVote = Tuple[int, int, str]
+
+_STOP = object()
+
+
+class VoteIngestQueue:
+	"""Write-behind buffer that group-commits validated votes from a background thread.
+
+	Vote endpoints call ``submit`` after validating the poll and option; the
+	writer drains up to ``max_batch`` votes, waiting at most ``max_delay``
+	seconds for a batch to fill, and writes them in one transaction so a burst
+	costs one commit (one fsync on SQLite) per batch instead of per vote.
+	``submit`` returns False once ``max_depth`` votes are pending so callers
+	can shed load.
+	"""
+
+	def __init__(
+		self,
+		engine: Engine,
+		max_batch: int = 500,
+		max_delay: float = 0.05,
+		max_depth: int = 10000,
+		on_commit: Optional[Callable[[List[votes.VoteOutcome]], None]] = None,
+	) -> None:
+		self._engine = engine
+		self.max_batch = max_batch
+		self.max_delay = max_delay
+		self.max_depth = max_depth
+		self._on_commit = on_commit
+		self._queue: queue.Queue = queue.Queue(maxsize=max_depth)
+		self._thread: Optional[threading.Thread] = None
+		self._lock = threading.Lock()
+		self.batches = 0
+		self.written = 0
+		self.rejected = 0
+		self.failed = 0
+
+	@property
+	def depth(self) -> int:
+		return self._queue.qsize()
+
+	def stats(self) -> Dict[str, int]:
+		return {
+			"depth": self.depth,
+			"max_depth": self.max_depth,
+			"batches": self.batches,
+			"written": self.written,
+			"rejected": self.rejected,
+			"failed": self.failed,
+		}
+
+	def start(self) -> None:
+		with self._lock:
+			if self._thread is not None and self._thread.is_alive():
+				return
+			self._thread = threading.Thread(target=self._run, name="vote-ingest", daemon=True)
+			self._thread.start()
+
+	def submit(self, poll_id: int, option_id: int, voter_id: str) -> bool:
+		self.start()
+		try:
+			self._queue.put_nowait((poll_id, option_id, voter_id))
+		except queue.Full:
+			self.rejected += 1
+			return False
+		return True
+
+	def flush(self) -> None:
+		"""Block until every vote submitted so far has been written."""
+		if self._thread is not None and self._thread.is_alive():
+			self._queue.join()
+
+	def stop(self, timeout: Optional[float] = 10.0) -> None:
+		"""Write everything still pending, then stop the writer thread."""
+		with self._lock:
+			thread = self._thread
+			self._thread = None
+		if thread is None or not thread.is_alive():
+			return
+		self._queue.put(_STOP)
+		thread.join(timeout)
+
+	def _run(self) -> None:
+		while True:
+			item = self._queue.get()
+			if item is _STOP:
+				self._queue.task_done()
+				return
+			batch: List[PendingVote] = [item]
+			stop = False
+			deadline = time.monotonic() + self.max_delay
+			while len(batch) < self.max_batch:
+				remaining = deadline - time.monotonic()
+				try:
+					nxt = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+				except queue.Empty:
+					break
+				if nxt is _STOP:
+					self._queue.task_done()
+					stop = True
+					break
+				batch.append(nxt)
+			try:
+				self._write(batch)
+			finally:
+				for _ in batch:
+					self._queue.task_done()
+			if stop:
+				self._drain_remaining()
+				return
+
+	def _drain_remaining(self) -> None:
+		pending: List[PendingVote] = []
+		while True:
+			try:
+				item = self._queue.get_nowait()
+			except queue.Empty:
+				break
+			self._queue.task_done()
+			if item is not _STOP:
+				pending.append(item)
+		for start in range(0, len(pending), self.max_batch):
+			self._write(pending[start:start + self.max_batch])
+
+	def _write(self, batch: Iterable[PendingVote]) -> None:
+		# later votes from the same voter on the same poll supersede earlier ones
+		latest: Dict[Tuple[int, str], int] = {}
+		for poll_id, option_id, voter_id in batch:
+			latest[(poll_id, voter_id)] = option_id
+		outcomes: List[votes.VoteOutcome] = []
+		try:
+			with Session(self._engine) as session:
+				for (poll_id, voter_id), option_id in latest.items():
+					outcomes.append(votes.cast_vote(session, poll_id, option_id, voter_id))
+				session.commit()
+		except Exception:
+			logger.exception("vote ingest batch of %d failed, retrying votes individually", len(latest))
+			outcomes = self._write_individually(latest)
+		else:
+			self.batches += 1
+			self.written += len(latest)
+		changed = [outcome for outcome in outcomes if outcome.changed]
+		if changed and self._on_commit is not None:
+			self._on_commit(changed)
+
+	def _write_individually(self, latest: Dict[Tuple[int, str], int]) -> List[votes.VoteOutcome]:
+		outcomes: List[votes.VoteOutcome] = []
+		for (poll_id, voter_id), option_id in latest.items():
+			try:
+				with Session(self._engine) as session:
+					outcome = votes.cast_vote(session, poll_id, option_id, voter_id)
+					session.commit()
+				outcomes.append(outcome)
+				self.written += 1
+			except Exception:
+				self.failed += 1
+				logger.exception("dropping vote for poll %s", poll_id)
+		return outcomes
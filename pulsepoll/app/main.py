@@ -1,91 +1,471 @@
 from __future__ import annotations
 
 import datetime as dt
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
-from fastapi import Depends, FastAPI, Form, HTTPException, Request, Response
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi import Depends, FastAPI, Form, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, HTMLResponse, RedirectResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.middleware.gzip import GZipMiddleware
+from jinja2.utils import htmlsafe_json_dumps
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.trustedhost import TrustedHostMiddleware
-from sqlmodel import select
-from sqlalchemy import func
+from sqlmodel import Session, select
 from pathlib import Path
+import asyncio
 import os
-import time
+import random
 import io
 import csv
+import math
+from email.utils import formatdate
 from urllib.parse import urlparse
 
-from .db import init_db, get_session
-from .models import Poll, Option, Vote
-from .utils import generate_short_code, get_or_set_voter_id, detect_language, SimpleRateLimiter, get_client_ip, compute_etag
+from .db import (
+	DB_MODE,
+	READ_YOUR_WRITES_SECONDS,
+	dispose_async_engine,
+	engine,
+	get_async_read_session,
+	get_async_session,
+	get_read_session,
+	get_session,
+	init_db,
+	read_engine,
+	reads_replica,
+	uses_replica,
+)
+from .models import Poll, Vote
+from .utils import get_or_set_voter_id, detect_language, get_client_ip, results_etag, mark_recent_write
 from .i18n import t
+from . import counters, metrics, votes
+from .realtime import BufferedDelta, ResultsHub, ResultsUpdate, replay_since
+from .ingest import VoteIngestQueue
+from .trending import TrendingIndex
+from .cache import LRUCache, PollCache, PollSnapshot
+from .ratelimit import build_rate_limiter
+from .export import EXPORT_FORMATS, iter_vote_export
+from .middleware import MetricsMiddleware, SecurityHeadersMiddleware, SelectiveGZipMiddleware, ServerTimingMiddleware
+from .timing import TimedTemplates
+from .fragments import FragmentCache, fill_results, mark_current_vote
+from .sitemap import SitemapStore, not_modified
+from .shortcode import ShortCodeAllocator, ShortCodeUnavailable
+from .polls import NewPoll, create_polls
 
 
 BASE_DIR = Path(__file__).parent
 TEMPLATES_DIR = str(BASE_DIR / "templates")
 STATIC_DIR = str(BASE_DIR / "static")
 
-templates = Jinja2Templates(directory=TEMPLATES_DIR)
-rate_limiter = SimpleRateLimiter()
+templates = TimedTemplates(directory=TEMPLATES_DIR)
+fragment_cache = FragmentCache(templates)
+rate_limiter = build_rate_limiter()
+poll_cache = PollCache()
+# short TTL bounds staleness from votes handled by other workers; local votes invalidate immediately
+results_versions = LRUCache(maxsize=50_000, ttl=1.0)
+short_codes = ShortCodeAllocator(
+	engine,
+	key=os.environ.get("SHORT_CODE_KEY") or None,
+	block_size=int(os.environ.get("SHORT_CODE_BLOCK_SIZE", "100")),
+)
+# keys the voter pseudonyms in raw vote exports; exports are disabled without it
+EXPORT_HASH_SALT = os.environ.get("EXPORT_HASH_SALT") or None
+sitemap_store = SitemapStore(
+	read_engine,
+	os.environ.get("SITEMAP_DIR", "./sitemaps"),
+	os.environ.get("PUBLIC_BASE_URL", "http://localhost:8000"),
+)
+
+# streams are resumable, so a long lifetime only bounds how long a worker holds a connection
+SSE_MAX_SECONDS = 1800
+SSE_HEARTBEAT_SECONDS = 15
+SSE_RETRY_MS = 3000
 
 
-def create_app() -> FastAPI:
+def _find_poll_id(code: str) -> Optional[int]:
+	with Session(engine) as session:
+		snapshot = poll_cache.get(session, code)
+	return snapshot.id if snapshot else None
+
+
+def _live_results(poll_id: int) -> Optional[dict]:
+	with Session(read_engine) as session:
+		snapshot = poll_cache.get_by_id(session, poll_id)
+		if snapshot is None:
+			return None
+		counts_map = counters.get_counts(session, poll_id)
+		version = counters.get_version(session, poll_id)
+	total = sum(counts_map.values())
+	return {"version": version, "total": total, "options": [{"id": o.id, "text": o.text, "count": int(counts_map.get(o.id, 0))} for o in snapshot.options]}
+
+
+results_hub = ResultsHub(_live_results, wrap=ResultsUpdate, compact=ResultsUpdate.buffered)
+
+
+trending_index = TrendingIndex()
+
+
+def _after_votes(outcomes: List[votes.VoteOutcome]) -> None:
+	for outcome in outcomes:
+		if outcome.created:
+			trending_index.record(outcome.poll_id)
+	for poll_id in {outcome.poll_id for outcome in outcomes if outcome.changed}:
+		results_versions.invalidate((poll_id, True))
+		results_versions.invalidate((poll_id, False))
+		results_hub.notify(poll_id)
+
+
+def _mark_written(response: Response) -> None:
+	# lets the client read its own write before the replica catches up
+	if uses_replica():
+		mark_recent_write(response, READ_YOUR_WRITES_SECONDS)
+
+
+def _results_version(session: Session, poll_id: int) -> int:
+	# replica versions may lag the primary's, so they are cached separately (True = primary)
+	key = (poll_id, not reads_replica(session))
+	version = results_versions.get(key)
+	if version is None:
+		version = counters.get_version(session, poll_id)
+		results_versions.set(key, version)
+	return version
+
+
+def _results_response(session: Session, code: str, if_none_match: Optional[str]) -> Response:
+	poll = poll_cache.get(session, code)
+	if not poll:
+		raise HTTPException(status_code=404, detail="not_found")
+	# answer revalidation from the results version alone, before reading counts
+	version = _results_version(session, poll.id)
+	etag = results_etag(poll.id, version)
+	if if_none_match == etag:
+		return Response(status_code=304, headers={"ETag": etag})
+	return JSONResponse(_results_payload(session, poll, version), headers={"ETag": etag})
+
+
+def _results_payload(session: Session, poll: PollSnapshot, version: int) -> dict:
+	"""Tally served by ``/p/{code}/results`` and rendered into the poll and embed pages."""
+	stored = counters.get_counts(session, poll.id)
+	counts = {opt.id: stored.get(opt.id, 0) for opt in poll.options}
+	total = sum(counts.values())
+	return {"poll": poll.code, "version": version, "total": total, "options": [{"id": o.id, "text": o.text, "count": counts[o.id]} for o in poll.options]}
+
+
+def _results_slots(session: Session, poll: PollSnapshot, version: int, bar: str) -> Tuple[str, str]:
+	"""Results rows (bars of height class ``bar``) and JSON state for a cached poll or embed page, rendered once per version."""
+
+	def build() -> Tuple[str, str]:
+		results = _results_payload(session, poll, version)
+		rows = templates.render("_results.html", {"results": results, "bar": bar})
+		return rows, str(htmlsafe_json_dumps({"results": results, "etag": results_etag(poll.id, version)}))
+
+	return fragment_cache.cached(("results", bar, poll.id, version), build)
+
+
+def _parse_seq(value: Optional[str]) -> Optional[int]:
+	try:
+		return int(value) if value else None
+	except ValueError:
+		return None
+
+
+def _resume(poll_id: int, since: Optional[int]) -> Tuple[List[BufferedDelta], Optional[int]]:
+	"""Buffered deltas that bring a client holding version ``since`` up to date, and the version it then holds.
+
+	When the buffer cannot bridge the gap, ``message_for`` sends the next
+	update as a snapshot, and not at all if the client already has it.
+	"""
+	if since is None:
+		return [], None
+	missed = replay_since(results_hub.history(poll_id), since) or []
+	return missed, missed[-1].version if missed else since
+
+
+def _poll_detail(session: Session, code: str) -> dict:
+	poll = poll_cache.get(session, code)
+	if not poll:
+		raise HTTPException(status_code=404, detail="not_found")
+	return {"code": poll.code, "question": poll.question, "options": [{"id": o.id, "text": o.text} for o in poll.options]}
+
+
+def _check_vote(poll: Optional[PollSnapshot], request: Request, option_id: int, limit: int) -> PollSnapshot:
+	if not poll:
+		raise HTTPException(status_code=404, detail="not_found")
+	# rate-limit voting per IP per poll
+	ip = get_client_ip(request)
+	if not rate_limiter.allow(f"vote:{poll.id}:{ip}", limit=limit, window_seconds=60):
+		raise HTTPException(status_code=429, detail="rate_limited")
+	if not poll.has_option(option_id):
+		raise HTTPException(status_code=400, detail="invalid_option")
+	return poll
+
+
+def _enqueue_vote(poll_id: int, option_id: int, voter_id: str) -> bool:
+	"""Hand the vote to the ingest queue when enabled; False means write it inline."""
+	if vote_ingest is None:
+		return False
+	if not vote_ingest.submit(poll_id, option_id, voter_id):
+		raise HTTPException(status_code=503, detail="busy", headers={"Retry-After": "1"})
+	return True
+
+
+def _create_polls(session, polls: List[NewPoll]) -> List[Tuple[int, str]]:
+	"""``create_polls`` with short code exhaustion reported as a retryable 503."""
+	try:
+		return create_polls(session, polls, short_codes)
+	except ShortCodeUnavailable:
+		raise HTTPException(status_code=503, detail="codes_unavailable", headers={"Retry-After": "1"})
+
+
+def _record_vote(session: Session, poll_id: int, option_id: int, voter_id: str) -> votes.VoteOutcome:
+	outcome = votes.cast_vote(session, poll_id, option_id, voter_id)
+	session.commit()
+	_after_votes([outcome])
+	return outcome
+
+
+def _wants_json(request: Request) -> bool:
+	"""True for ``fetch`` clients asking for JSON rather than a page to navigate to."""
+	accept = request.headers.get("accept", "")
+	return "application/json" in accept and "text/html" not in accept
+
+
+def _vote_reply(session: Session, poll: PollSnapshot, queued: bool, response: Response) -> dict:
+	"""JSON body of a vote: the fresh tally and its ``ETag``, or 202 while the vote waits in the ingest queue."""
+	if queued:
+		response.status_code = 202
+		return {"status": "queued"}
+	version = _results_version(session, poll.id)
+	response.headers["ETag"] = results_etag(poll.id, version)
+	return {"status": "ok", "results": _results_payload(session, poll, version)}
+
+
+def _warm_trending() -> None:
+	cutoff = dt.datetime.utcnow() - dt.timedelta(seconds=trending_index.window_seconds)
+	with Session(read_engine) as session:
+		rows = session.exec(
+			select(Vote.poll_id, Vote.created_at)
+			.where(Vote.created_at >= cutoff)
+			.order_by(Vote.created_at)
+			.execution_options(yield_per=10000)
+		)
+		trending_index.warm(rows)
+
+
+def _trending_polls(session: Session, limit: int) -> List[Poll]:
+	"""Top polls from the trending index, topped up with the newest polls."""
+	ids = [poll_id for poll_id, _ in trending_index.top(limit)]
+	polls_by_id = {p.id: p for p in session.exec(select(Poll).where(Poll.id.in_(ids)))} if ids else {}
+	polls = [polls_by_id[poll_id] for poll_id in ids if poll_id in polls_by_id]
+	if len(polls) < limit:
+		seen = set(polls_by_id)
+		newest = session.exec(select(Poll).order_by(Poll.created_at.desc()).limit(limit + len(seen)))
+		polls.extend(p for p in newest if p.id not in seen)
+	return polls[:limit]
+
+
+# bumped when this process creates polls, so listings topped up with the newest polls re-render
+_listing_generation = 0
+
+
+def _polls_created(poll_ids: List[int]) -> None:
+	global _listing_generation
+	_listing_generation += 1
+	for poll_id in poll_ids:
+		sitemap_store.mark_dirty(poll_id)
+
+
+def _listing_version(limit: int) -> Tuple[Tuple[int, ...], int]:
+	return tuple(poll_id for poll_id, _ in trending_index.top(limit)), _listing_generation
+
+
+def _page_url(request: Request) -> str:
+	"""The page URL without its query string, as shown for sharing and in ``og:url``."""
+	return str(request.url.replace(query=""))
+
+
+metrics.instrument_engine(engine, "primary")
+if read_engine is not engine:
+	metrics.instrument_engine(read_engine, "replica")
+
+
+def _runtime_metrics() -> List[metrics.Family]:
+	engines = {"primary": engine}
+	if read_engine is not engine:
+		engines["replica"] = read_engine
+	families = metrics.pool_families(engines)
+	families.append(("pulsepoll_rate_limit_rejections_total", "counter", "Requests rejected by the rate limiter.", [({}, rate_limiter.stats()["rejected"])]))
+	caches = {"poll_snapshot": poll_cache.stats(), "results_version": results_versions.stats(), "fragments": fragment_cache.stats()}
+	for suffix, kind, key, help in (
+		("hits_total", "counter", "hits", "Cache lookups answered from the cache."),
+		("misses_total", "counter", "misses", "Cache lookups that missed."),
+		("hit_ratio", "gauge", "hit_ratio", "Cache hits over lookups since start."),
+	):
+		families.append((f"pulsepoll_cache_{suffix}", kind, help, [({"cache": name}, stats[key]) for name, stats in caches.items()]))
+	families.append(("pulsepoll_results_subscribers", "gauge", "SSE and WebSocket subscribers across polls.", [({}, results_hub.subscriber_count())]))
+	if vote_ingest is not None:
+		families.append(("pulsepoll_ingest_queue_depth", "gauge", "Votes waiting for the ingest writer.", [({}, vote_ingest.depth)]))
+	return families
+
+
+metrics.registry.add_collector(_runtime_metrics)
+
+
+VOTE_BATCH_MAX = 1000
+# per client IP, counted per record so large batches cannot multiply the allowance
+VOTE_BATCH_RECORDS_PER_MINUTE = 2000
+
+
+def _parse_batch_vote(item: object) -> Optional[votes.BatchVote]:
+	if not isinstance(item, dict):
+		return None
+	code, voter_id, key = item.get("code"), item.get("voter_id"), item.get("idempotency_key")
+	if not isinstance(code, str) or not isinstance(voter_id, str) or not voter_id.strip():
+		return None
+	option_id = item.get("option_id")
+	if isinstance(option_id, bool) or (isinstance(option_id, float) and not math.isfinite(option_id)):
+		return None
+	try:
+		option_id = int(option_id)
+		client_ts = _parse_client_ts(item.get("client_ts"))
+	except (TypeError, ValueError, OverflowError, OSError):
+		return None
+	return votes.BatchVote(code, option_id, voter_id.strip(), client_ts, str(key) if key is not None else None)
+
+
+POLL_BATCH_MAX = 500
+# per client IP, counted per poll like VOTE_BATCH_RECORDS_PER_MINUTE
+POLL_BATCH_POLLS_PER_HOUR = 1000
+
+
+def _parse_new_poll(item: object, default_locale: str) -> Optional[NewPoll]:
+	if not isinstance(item, dict) or not isinstance(item.get("options"), list):
+		return None
+	question = str(item.get("question", "")).strip()
+	options = tuple(str(o).strip() for o in item["options"] if str(o).strip())
+	if not question or len(options) < 2:
+		return None
+	locale = item.get("locale")
+	return NewPoll(question, options, str(locale) if locale else default_locale)
+
+
+def _parse_client_ts(value: object) -> Optional[dt.datetime]:
+	"""Accept epoch seconds or ISO 8601; returns naive UTC like ``Vote.created_at``.
+
+	Raises ``ValueError`` for booleans and non-finite numbers, and ``OverflowError``
+	or ``OSError`` for epochs outside what the platform can represent.
+	"""
+	if value is None:
+		return None
+	if isinstance(value, bool) or (isinstance(value, float) and not math.isfinite(value)):
+		raise ValueError("invalid timestamp")
+	if isinstance(value, (int, float)):
+		return dt.datetime.fromtimestamp(value, dt.timezone.utc).replace(tzinfo=None)
+	parsed = dt.datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+	if parsed.tzinfo is not None:
+		parsed = parsed.astimezone(dt.timezone.utc).replace(tzinfo=None)
+	return parsed
+
+
+# VOTE_INGEST_MODE=queue makes vote endpoints enqueue and return; a background writer group-commits
+vote_ingest: Optional[VoteIngestQueue] = None
+if os.environ.get("VOTE_INGEST_MODE", "sync") == "queue":
+	vote_ingest = VoteIngestQueue(
+		engine,
+		max_batch=int(os.environ.get("VOTE_INGEST_MAX_BATCH", "500")),
+		max_delay=int(os.environ.get("VOTE_INGEST_MAX_DELAY_MS", "50")) / 1000,
+		max_depth=int(os.environ.get("VOTE_INGEST_MAX_DEPTH", "10000")),
+		on_commit=_after_votes,
+	)
+
+
+SECURITY_HEADERS = {
+	"X-Content-Type-Options": "nosniff",
+	"X-Frame-Options": "DENY",
+	"Referrer-Policy": "strict-origin-when-cross-origin",
+	"Permissions-Policy": "geolocation=(), microphone=(), camera=()",
+	"Content-Security-Policy": "default-src 'self'; script-src 'self' 'unsafe-inline' https://cdn.tailwindcss.com https://cdn.jsdelivr.net; style-src 'self' 'unsafe-inline' https://fonts.googleapis.com; font-src 'self' https://fonts.gstatic.com; img-src 'self' data: https://api.qrserver.com; connect-src 'self'; frame-ancestors 'none'",
+}
+HSTS = "max-age=31536000; includeSubDomains; preload"
+
+
+def create_app(db_mode: Optional[str] = None) -> FastAPI:
+	db_mode = db_mode or DB_MODE
+	if db_mode not in ("sync", "async"):
+		raise ValueError(f"unknown DB_MODE: {db_mode}")
 	app = FastAPI(title="PulsePoll")
 
-	app.add_middleware(GZipMiddleware, minimum_size=500)
+	app.add_middleware(SelectiveGZipMiddleware, minimum_size=500)
 	app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_headers=["*"], allow_methods=["*"])
 	allowed_hosts = os.environ.get("ALLOWED_HOSTS")
 	if allowed_hosts:
 		app.add_middleware(TrustedHostMiddleware, allowed_hosts=[h.strip() for h in allowed_hosts.split(",") if h.strip()])
 
-	@app.middleware("http")
-	async def security_headers(request: Request, call_next):
-		response: Response = await call_next(request)
-		response.headers.setdefault("X-Content-Type-Options", "nosniff")
-		response.headers.setdefault("X-Frame-Options", "DENY")
-		response.headers.setdefault("Referrer-Policy", "strict-origin-when-cross-origin")
-		response.headers.setdefault("Permissions-Policy", "geolocation=(), microphone=(), camera=()")
-		csp = "default-src 'self'; script-src 'self' 'unsafe-inline' https://cdn.tailwindcss.com https://cdn.jsdelivr.net; style-src 'self' 'unsafe-inline' https://fonts.googleapis.com; font-src 'self' https://fonts.gstatic.com; img-src 'self' data: https://api.qrserver.com; connect-src 'self'; frame-ancestors 'none'"
-		response.headers.setdefault("Content-Security-Policy", csp)
-		if request.url.scheme == "https":
-			response.headers.setdefault("Strict-Transport-Security", "max-age=31536000; includeSubDomains; preload")
-		return response
+	app.add_middleware(SecurityHeadersMiddleware, headers=SECURITY_HEADERS, hsts=HSTS)
 
 	app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 
 	@app.on_event("startup")
 	def _startup() -> None:
 		init_db()
-
-	@app.middleware("http")
-	async def add_lang_to_state(request: Request, call_next):
-		response: Response = await call_next(request)
-		lang = detect_language(request)
-		if not request.cookies.get("lang"):
-			response.set_cookie("lang", lang, max_age=60 * 60 * 24 * 365, samesite="lax")
-		return response
+		votes.ensure_unique_index(engine)
+		with Session(engine) as session:
+			counters.backfill_if_empty(session)
+		_warm_trending()
+		sitemap_store.start()
+
+	@app.on_event("shutdown")
+	async def _shutdown() -> None:
+		await results_hub.close()
+		if vote_ingest is not None:
+			await run_in_threadpool(vote_ingest.stop)
+		await dispose_async_engine()
+
+	# outermost, so timings include every other middleware
+	app.add_middleware(MetricsMiddleware)
+	app.add_middleware(
+		ServerTimingMiddleware,
+		header=os.environ.get("SERVER_TIMING", "1") != "0",
+		slow_ms=float(os.environ["SLOW_REQUEST_MS"]) if os.environ.get("SLOW_REQUEST_MS") else None,
+		max_queries=int(os.environ["SLOW_REQUEST_QUERIES"]) if os.environ.get("SLOW_REQUEST_QUERIES") else None,
+	)
 
 	@app.get("/health")
 	async def health() -> dict:
-		return {"status": "ok", "time": dt.datetime.utcnow().isoformat()}
+		data = {"status": "ok", "time": dt.datetime.utcnow().isoformat()}
+		data["poll_cache"] = poll_cache.stats()
+		data["fragment_cache"] = fragment_cache.stats()
+		data["rate_limiter"] = await run_in_threadpool(rate_limiter.stats)
+		if vote_ingest is not None:
+			data["ingest"] = vote_ingest.stats()
+		return data
+
+	@app.get("/metrics")
+	def metrics_endpoint() -> Response:
+		"""Prometheus text exposition of this worker's metrics."""
+		return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
 
 	@app.get("/robots.txt")
 	def robots() -> PlainTextResponse:
 		return PlainTextResponse("User-agent: *\nAllow: /\n")
 
 	@app.get("/sitemap.xml")
-	def sitemap(request: Request, session=Depends(get_session)) -> PlainTextResponse:
-		root = str(request.base_url).rstrip("/")
-		polls = list(session.exec(select(Poll).order_by(Poll.created_at.desc()).limit(200)))
-		urls = [f"<url><loc>{root}/</loc></url>", f"<url><loc>{root}/trending</loc></url>"] + [f"<url><loc>{root}/p/{p.code}</loc></url>" for p in polls]
-		xml = "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n" \
-			+ "<urlset xmlns=\"http://www.sitemaps.org/schemas/sitemap/0.9\">" \
-			+ "".join(urls) + "</urlset>"
-		return PlainTextResponse(xml, media_type="application/xml")
+	def sitemap(request: Request):
+		xml, etag, mtime = sitemap_store.index()
+		headers = {"ETag": etag, "Last-Modified": formatdate(mtime, usegmt=True), "Cache-Control": "public, max-age=300"}
+		if not_modified(request.headers, etag, mtime):
+			return Response(status_code=304, headers=headers)
+		return Response(xml, media_type="application/xml", headers=headers)
+
+	@app.get("/sitemaps/{name}.xml.gz")
+	def sitemap_shard(name: str, request: Request):
+		info = sitemap_store.shard_file(name)
+		if info is None:
+			raise HTTPException(status_code=404, detail="not_found")
+		headers = {"ETag": info.etag, "Last-Modified": info.last_modified, "Cache-Control": "public, max-age=3600"}
+		if not_modified(request.headers, info.etag, info.mtime):
+			return Response(status_code=304, headers=headers)
+		return FileResponse(info.path, media_type="application/gzip", headers=headers)
 
 	@app.get("/lang/{lang}")
 	def switch_lang(lang: str, request: Request):
@@ -96,24 +476,14 @@ def create_app() -> FastAPI:
 		return resp
 
 	@app.get("/", response_class=HTMLResponse)
-	def index(request: Request, session=Depends(get_session)):
+	def index(request: Request, session=Depends(get_read_session)):
 		lang = detect_language(request)
-		cutoff = dt.datetime.utcnow() - dt.timedelta(days=1)
-		polls_recent = list(session.exec(select(Poll).order_by(Poll.created_at.desc()).limit(100)))
-		# aggregate vote counts per poll in last 24h
-		rows = session.exec(
-			select(Vote.poll_id, func.count(Vote.id)).where(Vote.created_at >= cutoff).group_by(Vote.poll_id)
-		).all()
-		counts_per_poll = {poll_id: count for poll_id, count in rows}
-		trending = sorted(
-			polls_recent,
-			key=lambda p: (counts_per_poll.get(p.id, 0), p.created_at),
-			reverse=True,
-		)[:10]
-		return templates.TemplateResponse(
-			"index.html",
-			{"request": request, "t": lambda k: t(lang, k), "trending": trending, "lang": lang},
+		url = _page_url(request)
+		html = fragment_cache.render(
+			"index.html", lang, None, _listing_version(10), url,
+			lambda: {"request": request, "t": lambda k: t(lang, k), "trending": _trending_polls(session, 10), "lang": lang, "page_url": url},
 		)
+		return HTMLResponse(html)
 
 	@app.get("/create", response_class=HTMLResponse)
 	def create_page(request: Request):
@@ -141,59 +511,67 @@ def create_app() -> FastAPI:
 		client_ip = get_client_ip(request)
 		if not rate_limiter.allow(f"create:{client_ip}", limit=20, window_seconds=60 * 60):
 			raise HTTPException(status_code=429, detail="rate_limited")
-		code = generate_short_code()
-		while session.exec(select(Poll).where(Poll.code == code)).first() is not None:
-			code = generate_short_code()
-		poll = Poll(code=code, question=question.strip(), locale=lang)
-		session.add(poll)
-		session.commit()
-		session.refresh(poll)
-		for text in options_text:
-			opt = Option(poll_id=poll.id, text=text)
-			session.add(opt)
-		session.commit()
-		return RedirectResponse(url=f"/p/{code}", status_code=303)
+		poll_id, code = _create_polls(session, [NewPoll(question.strip(), tuple(options_text), lang)])[0]
+		_polls_created([poll_id])
+		redirect = RedirectResponse(url=f"/p/{code}", status_code=303)
+		_mark_written(redirect)
+		return redirect
 
 	@app.get("/p/{code}", response_class=HTMLResponse)
-	def poll_page(code: str, request: Request, session=Depends(get_session)):
+	def poll_page(code: str, request: Request, session=Depends(get_read_session)):
 		lang = detect_language(request)
-		poll = session.exec(select(Poll).where(Poll.code == code)).first()
+		poll = poll_cache.get(session, code)
 		if not poll:
 			return templates.TemplateResponse(
 				"404.html",
 				{"request": request, "message": t(lang, "poll_not_found"), "t": lambda k: t(lang, k), "lang": lang},
 				status_code=404,
 			)
-		options = list(session.exec(select(Option).where(Option.poll_id == poll.id)))
-		voter_id = request.cookies.get("voter_id")
-		current_vote = None
-		if voter_id:
-			current_vote = session.exec(
-				select(Vote).where(Vote.poll_id == poll.id, Vote.voter_id == voter_id)
-			).first()
-		return templates.TemplateResponse(
-			"poll.html",
-			{
+		url = _page_url(request)
+		version = _results_version(session, poll.id)
+		# the page is immutable; only the results block changes with each vote
+		html = fragment_cache.render(
+			"poll.html", lang, code, poll.id, url,
+			lambda: {
 				"request": request,
 				"t": lambda k: t(lang, k),
 				"poll": poll,
-				"options": options,
-				"current_vote": current_vote,
+				"options": poll.options,
 				"lang": lang,
+				"page_url": url,
 			},
 		)
+		html = fill_results(html, _results_slots(session, poll, version, "h-3"))
+		voter_id = request.cookies.get("voter_id")
+		if voter_id:
+			current_option = session.exec(
+				select(Vote.option_id).where(Vote.poll_id == poll.id, Vote.voter_id == voter_id)
+			).first()
+			if current_option is not None:
+				html = mark_current_vote(html, current_option)
+		return HTMLResponse(html)
 
 	@app.get("/e/{code}", response_class=HTMLResponse)
-	def embed_page(code: str, request: Request, session=Depends(get_session)):
+	def embed_page(code: str, request: Request, session=Depends(get_read_session)):
 		lang = detect_language(request)
-		poll = session.exec(select(Poll).where(Poll.code == code)).first()
+		poll = poll_cache.get(session, code)
 		if not poll:
 			return PlainTextResponse("Not found", status_code=404)
-		options = list(session.exec(select(Option).where(Option.poll_id == poll.id)))
-		resp = templates.TemplateResponse(
-			"embed.html",
-			{"request": request, "poll": poll, "options": options, "t": lambda k: t(lang, k), "lang": lang},
+		url = _page_url(request)
+		version = _results_version(session, poll.id)
+		html = fragment_cache.render(
+			"embed.html", lang, code, poll.id, url,
+			lambda: {
+				"request": request,
+				"poll": poll,
+				"options": poll.options,
+				"t": lambda k: t(lang, k),
+				"lang": lang,
+				"page_url": url,
+			},
 		)
+		html = fill_results(html, _results_slots(session, poll, version, "h-2"))
+		resp = HTMLResponse(html)
 		# Relax frame embedding for embeddable endpoint
 		resp.headers["X-Frame-Options"] = "ALLOWALL"
 		resp.headers["Content-Security-Policy"] = "default-src 'self'; frame-ancestors *; script-src 'self' https://cdn.tailwindcss.com; style-src 'self' 'unsafe-inline'"
@@ -227,63 +605,54 @@ def create_app() -> FastAPI:
 			"height": maxheight,
 		}
 
-	@app.post("/p/{code}/vote")
-	def vote_on_poll(code: str, request: Request, response: Response, option_id: int = Form(...), session=Depends(get_session)):
-		lang = detect_language(request)
-		poll = session.exec(select(Poll).where(Poll.code == code)).first()
-		if not poll:
-			raise HTTPException(status_code=404, detail="not_found")
-		# rate-limit voting per IP per poll
-		ip = get_client_ip(request)
-		if not rate_limiter.allow(f"vote:{poll.id}:{ip}", limit=60, window_seconds=60):
-			raise HTTPException(status_code=429, detail="rate_limited")
-		option = session.exec(select(Option).where(Option.id == option_id, Option.poll_id == poll.id)).first()
-		if not option:
-			raise HTTPException(status_code=400, detail="invalid_option")
-		voter_id = get_or_set_voter_id(request, response)
-		existing_vote = session.exec(
-			select(Vote).where(Vote.poll_id == poll.id, Vote.voter_id == voter_id)
-		).first()
-		if existing_vote:
-			existing_vote.option_id = option.id
-		else:
-			vote = Vote(poll_id=poll.id, option_id=option.id, voter_id=voter_id)
-			session.add(vote)
-		session.commit()
-		return RedirectResponse(url=f"/p/{code}", status_code=303)
-
-	@app.get("/p/{code}/results")
-	def poll_results(code: str, request: Request, session=Depends(get_session)):
-		poll = session.exec(select(Poll).where(Poll.code == code)).first()
-		if not poll:
-			raise HTTPException(status_code=404, detail="not_found")
-		options = list(session.exec(select(Option).where(Option.poll_id == poll.id)))
-		# aggregate counts via GROUP BY
-		rows = session.exec(
-			select(Vote.option_id, func.count(Vote.id)).where(Vote.poll_id == poll.id).group_by(Vote.option_id)
-		).all()
-		counts = {opt.id: 0 for opt in options}
-		for option_id, count in rows:
-			counts[option_id] = count
-		total = sum(counts.values())
-		payload = {"poll": poll.code, "total": total, "options": [{"id": o.id, "text": o.text, "count": counts[o.id]} for o in options]}
-		etag = compute_etag(payload)
-		if request.headers.get("if-none-match") == etag:
-			return Response(status_code=304)
-		return JSONResponse(payload, headers={"ETag": etag})
+	if db_mode == "async":
+		# same logic as the sync endpoints below, run through AsyncSession.run_sync on the event loop
+		@app.post("/p/{code}/vote")
+		async def vote_on_poll(code: str, request: Request, response: Response, option_id: int = Form(...), session=Depends(get_async_session)):
+			# the limiter may block on its SQLite file, so keep it off the event loop
+			poll = await run_in_threadpool(_check_vote, await session.run_sync(poll_cache.get, code), request, option_id, limit=60)
+			# cookies on the injected response are dropped when another Response is returned
+			reply = response if _wants_json(request) else RedirectResponse(url=f"/p/{code}", status_code=303)
+			voter_id = get_or_set_voter_id(request, reply)
+			_mark_written(reply)
+			queued = _enqueue_vote(poll.id, option_id, voter_id)
+			if not queued:
+				await session.run_sync(_record_vote, poll.id, option_id, voter_id)
+			if reply is response:
+				return await session.run_sync(_vote_reply, poll, queued, response)
+			return reply
+
+		@app.get("/p/{code}/results")
+		async def poll_results(code: str, request: Request, session=Depends(get_async_read_session)):
+			return await session.run_sync(_results_response, code, request.headers.get("if-none-match"))
+	else:
+		@app.post("/p/{code}/vote")
+		def vote_on_poll(code: str, request: Request, response: Response, option_id: int = Form(...), session=Depends(get_session)):
+			"""Form votes: the fresh tally as JSON for ``fetch`` clients, a redirect back to the poll for plain forms."""
+			poll = _check_vote(poll_cache.get(session, code), request, option_id, limit=60)
+			# cookies on the injected response are dropped when another Response is returned
+			reply = response if _wants_json(request) else RedirectResponse(url=f"/p/{code}", status_code=303)
+			voter_id = get_or_set_voter_id(request, reply)
+			_mark_written(reply)
+			queued = _enqueue_vote(poll.id, option_id, voter_id)
+			if not queued:
+				_record_vote(session, poll.id, option_id, voter_id)
+			if reply is response:
+				return _vote_reply(session, poll, queued, response)
+			return reply
+
+		@app.get("/p/{code}/results")
+		def poll_results(code: str, request: Request, session=Depends(get_read_session)):
+			return _results_response(session, code, request.headers.get("if-none-match"))
 
 	@app.get("/p/{code}/export.csv")
-	def export_csv(code: str, session=Depends(get_session)):
-		poll = session.exec(select(Poll).where(Poll.code == code)).first()
+	def export_csv(code: str, session=Depends(get_read_session)):
+		poll = poll_cache.get(session, code)
 		if not poll:
 			raise HTTPException(status_code=404, detail="not_found")
-		options = list(session.exec(select(Option).where(Option.poll_id == poll.id)))
-		rows = session.exec(
-			select(Vote.option_id, func.count(Vote.id)).where(Vote.poll_id == poll.id).group_by(Vote.option_id)
-		).all()
-		counts = {opt.id: 0 for opt in options}
-		for option_id, count in rows:
-			counts[option_id] = count
+		options = poll.options
+		stored = counters.get_counts(session, poll.id)
+		counts = {opt.id: stored.get(opt.id, 0) for opt in options}
 		buf = io.StringIO()
 		writer = csv.writer(buf)
 		writer.writerow(["option_id", "option_text", "count"])
@@ -292,44 +661,111 @@ def create_app() -> FastAPI:
 		data = buf.getvalue()
 		return Response(content=data, media_type="text/csv", headers={"Content-Disposition": f"attachment; filename={poll.code}_results.csv"})
 
-	@app.get("/p/{code}/events")
-	def sse_events(code: str, session=Depends(get_session)):
-		poll = session.exec(select(Poll).where(Poll.code == code)).first()
+	@app.get("/p/{code}/votes.{fmt}")
+	def export_votes(code: str, fmt: str, session=Depends(get_read_session)):
+		"""Stream raw votes (hashed voter ids) as CSV or JSONL."""
+		if fmt not in EXPORT_FORMATS:
+			raise HTTPException(status_code=404, detail="not_found")
+		poll = poll_cache.get(session, code)
 		if not poll:
 			raise HTTPException(status_code=404, detail="not_found")
-		options = list(session.exec(select(Option).where(Option.poll_id == poll.id)))
-		option_ids = [o.id for o in options]
-
-		def event_stream():
-			for _ in range(120):
-				rows = session.exec(
-					select(Vote.option_id, func.count(Vote.id)).where(Vote.poll_id == poll.id).group_by(Vote.option_id)
-				).all()
-				counts_map = {oid: cnt for oid, cnt in rows}
-				total = sum(counts_map.values())
-				payload = {"total": total, "options": [{"id": o.id, "text": o.text, "count": int(counts_map.get(o.id, 0))} for o in options]}
-				yield f"data: {payload}\n\n"
-				time.sleep(2)
-
-		return StreamingResponse(event_stream(), media_type="text/event-stream")
+		if EXPORT_HASH_SALT is None:
+			raise HTTPException(status_code=503, detail="export_disabled")
+		return StreamingResponse(
+			iter_vote_export(read_engine, poll, fmt, EXPORT_HASH_SALT),
+			media_type=EXPORT_FORMATS[fmt],
+			headers={"Content-Disposition": f"attachment; filename={poll.code}_votes.{fmt}"},
+		)
+
+	@app.get("/p/{code}/events")
+	async def sse_events(code: str, request: Request):
+		"""JSON results events with ids.
+
+		Reconnects resume from the ring buffer with ``Last-Event-ID``; pages that
+		rendered the results pass the version they hold as ``?since=`` instead.
+		"""
+		poll_id = await run_in_threadpool(_find_poll_id, code)
+		if poll_id is None:
+			raise HTTPException(status_code=404, detail="not_found")
+		since = _parse_seq(request.headers.get("last-event-id") or request.query_params.get("since"))
+
+		async def event_stream():
+			loop = asyncio.get_running_loop()
+			# jitter both the lifetime and the reconnect delay so viewers do not reconnect in lockstep
+			deadline = loop.time() + SSE_MAX_SECONDS * random.uniform(0.8, 1.0)
+			yield f"retry: {random.randint(SSE_RETRY_MS, 2 * SSE_RETRY_MS)}\n\n"
+			with metrics.sse_connections.track():
+				async with results_hub.subscribe(poll_id) as queue:
+					missed, seq = _resume(poll_id, since)
+					for update in missed:
+						yield f"id: {update.version}\ndata: {update.delta_message()}\n\n"
+					while True:
+						remaining = deadline - loop.time()
+						if remaining <= 0:
+							break
+						try:
+							update = await asyncio.wait_for(queue.get(), timeout=min(SSE_HEARTBEAT_SECONDS, remaining))
+						except asyncio.TimeoutError:
+							yield ": ping\n\n"
+							continue
+						message = update.message_for(seq)
+						if message is not None:
+							yield f"id: {update.version}\ndata: {message}\n\n"
+							seq = update.version
+
+		return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+	@app.websocket("/ws/p/{code}")
+	async def results_socket(websocket: WebSocket, code: str):
+		"""Live results: one full snapshot, then ``[option_id, count]`` deltas tagged with ``seq``.
+
+		A client that already holds a version (``?since=``) gets only the deltas after it.
+		"""
+		poll_id = await run_in_threadpool(_find_poll_id, code)
+		if poll_id is None:
+			await websocket.close(code=4404)
+			return
+		await websocket.accept()
+		since = _parse_seq(websocket.query_params.get("since"))
+
+		async def push(queue: asyncio.Queue) -> None:
+			missed, seq = _resume(poll_id, since)
+			for update in missed:
+				await websocket.send_text(update.delta_message())
+			while True:
+				update: ResultsUpdate = await queue.get()
+				message = update.message_for(seq)
+				if message is not None:
+					await websocket.send_text(message)
+					seq = update.version
+
+		async with results_hub.subscribe(poll_id) as queue:
+			metrics.websocket_connections.inc()
+			sender = asyncio.create_task(push(queue))
+			try:
+				while True:
+					message = await websocket.receive()
+					if message["type"] == "websocket.disconnect":
+						break
+			except WebSocketDisconnect:
+				pass
+			finally:
+				metrics.websocket_connections.dec()
+				sender.cancel()
+				await asyncio.gather(sender, return_exceptions=True)
 
 	@app.get("/trending", response_class=HTMLResponse)
-	def trending(request: Request, session=Depends(get_session)):
+	def trending(request: Request, session=Depends(get_read_session)):
 		lang = detect_language(request)
-		cutoff = dt.datetime.utcnow() - dt.timedelta(days=1)
-		polls_recent = list(session.exec(select(Poll).order_by(Poll.created_at.desc()).limit(100)))
-		rows = session.exec(
-			select(Vote.poll_id, func.count(Vote.id)).where(Vote.created_at >= cutoff).group_by(Vote.poll_id)
-		).all()
-		counts_per_poll = {poll_id: count for poll_id, count in rows}
-		polls = sorted(polls_recent, key=lambda p: (counts_per_poll.get(p.id, 0), p.created_at), reverse=True)
-		return templates.TemplateResponse(
-			"trending.html",
-			{"request": request, "t": lambda k: t(lang, k), "polls": polls, "lang": lang},
+		url = _page_url(request)
+		html = fragment_cache.render(
+			"trending.html", lang, None, _listing_version(100), url,
+			lambda: {"request": request, "t": lambda k: t(lang, k), "polls": _trending_polls(session, 100), "lang": lang, "page_url": url},
 		)
+		return HTMLResponse(html)
 
 	@app.get("/random")
-	def random_poll(session=Depends(get_session)):
+	def random_poll(session=Depends(get_read_session)):
 		polls = list(session.exec(select(Poll).order_by(Poll.created_at.desc()).limit(100)))
 		if not polls:
 			raise HTTPException(status_code=404, detail="no_polls")
@@ -338,7 +774,7 @@ def create_app() -> FastAPI:
 		return RedirectResponse(url=f"/p/{poll.code}")
 
 	@app.post("/api/polls")
-	def api_create_poll(payload: dict, request: Request, session=Depends(get_session)):
+	def api_create_poll(payload: dict, request: Request, response: Response, session=Depends(get_session)):
 		question = str(payload.get("question", "")).strip()
 		options: List[str] = [str(o).strip() for o in payload.get("options", []) if str(o).strip()]
 		if not question or len(options) < 2:
@@ -346,47 +782,100 @@ def create_app() -> FastAPI:
 		client_ip = get_client_ip(request)
 		if not rate_limiter.allow(f"create:{client_ip}", limit=100, window_seconds=60 * 60):
 			raise HTTPException(status_code=429, detail="rate_limited")
-		code = generate_short_code()
-		while session.exec(select(Poll).where(Poll.code == code)).first() is not None:
-			code = generate_short_code()
-		poll = Poll(code=code, question=question, locale=detect_language(request))
-		session.add(poll)
-		session.commit()
-		session.refresh(poll)
-		for text in options:
-			session.add(Option(poll_id=poll.id, text=text))
-		session.commit()
-		return {"code": poll.code}
-
-	@app.get("/api/polls/{code}")
-	def api_get_poll(code: str, session=Depends(get_session)):
-		poll = session.exec(select(Poll).where(Poll.code == code)).first()
-		if not poll:
-			raise HTTPException(status_code=404, detail="not_found")
-		options = list(session.exec(select(Option).where(Option.poll_id == poll.id)))
-		return {"code": poll.code, "question": poll.question, "options": [{"id": o.id, "text": o.text} for o in options]}
-
-	@app.post("/api/polls/{code}/vote")
-	def api_vote(code: str, payload: dict, request: Request, response: Response, session=Depends(get_session)):
-		option_id = int(payload.get("option_id"))
-		poll = session.exec(select(Poll).where(Poll.code == code)).first()
-		if not poll:
-			raise HTTPException(status_code=404, detail="not_found")
-		# rate-limit voting per IP per poll
+		poll_id, code = _create_polls(session, [NewPoll(question, tuple(options), detect_language(request))])[0]
+		_polls_created([poll_id])
+		_mark_written(response)
+		return {"code": code}
+
+	@app.post("/api/polls:batch")
+	def api_create_polls(payload: dict, request: Request, response: Response, session=Depends(get_session)):
+		"""Bulk poll creation for importers; all valid polls are created in one transaction."""
+		items = payload.get("polls")
+		if not isinstance(items, list) or not items:
+			raise HTTPException(status_code=400, detail="invalid_input")
+		if len(items) > POLL_BATCH_MAX:
+			raise HTTPException(status_code=413, detail="batch_too_large")
+		client_ip = get_client_ip(request)
+		if not rate_limiter.allow(f"create-batch:{client_ip}", limit=POLL_BATCH_POLLS_PER_HOUR, window_seconds=60 * 60, cost=len(items)):
+			raise HTTPException(status_code=429, detail="rate_limited")
+		lang = detect_language(request)
+		parsed = [_parse_new_poll(item, lang) for item in items]
+		valid = [p for p in parsed if p is not None]
+		created = _create_polls(session, valid) if valid else []
+		_polls_created([poll_id for poll_id, _ in created])
+		codes = iter(code for _, code in created)
+		results = []
+		for i, new_poll in enumerate(parsed):
+			if new_poll is None:
+				results.append({"index": i, "status": "invalid"})
+				continue
+			results.append({"index": i, "status": "created", "code": next(codes)})
+		_mark_written(response)
+		return {"created": len(valid), "results": results}
+
+	if db_mode == "async":
+		@app.get("/api/polls/{code}")
+		async def api_get_poll(code: str, session=Depends(get_async_read_session)):
+			return await session.run_sync(_poll_detail, code)
+
+		@app.post("/api/polls/{code}/vote")
+		async def api_vote(code: str, payload: dict, request: Request, response: Response, session=Depends(get_async_session)):
+			option_id = int(payload.get("option_id"))
+			# the limiter may block on its SQLite file, so keep it off the event loop
+			poll = await run_in_threadpool(_check_vote, await session.run_sync(poll_cache.get, code), request, option_id, limit=120)
+			voter_id = get_or_set_voter_id(request, response)
+			_mark_written(response)
+			queued = _enqueue_vote(poll.id, option_id, voter_id)
+			if not queued:
+				await session.run_sync(_record_vote, poll.id, option_id, voter_id)
+			return await session.run_sync(_vote_reply, poll, queued, response)
+	else:
+		@app.get("/api/polls/{code}")
+		def api_get_poll(code: str, session=Depends(get_read_session)):
+			return _poll_detail(session, code)
+
+		@app.post("/api/polls/{code}/vote")
+		def api_vote(code: str, payload: dict, request: Request, response: Response, session=Depends(get_session)):
+			option_id = int(payload.get("option_id"))
+			poll = _check_vote(poll_cache.get(session, code), request, option_id, limit=120)
+			voter_id = get_or_set_voter_id(request, response)
+			_mark_written(response)
+			queued = _enqueue_vote(poll.id, option_id, voter_id)
+			if not queued:
+				_record_vote(session, poll.id, option_id, voter_id)
+			return _vote_reply(session, poll, queued, response)
+
+	@app.post("/api/votes:batch")
+	def api_vote_batch(payload: dict, request: Request, session=Depends(get_session)):
+		"""Bulk vote upload for kiosks and integrations; one transaction, one status per record."""
+		items = payload.get("votes")
+		if not isinstance(items, list) or not items:
+			raise HTTPException(status_code=400, detail="invalid_input")
+		if len(items) > VOTE_BATCH_MAX:
+			raise HTTPException(status_code=413, detail="batch_too_large")
 		ip = get_client_ip(request)
-		if not rate_limiter.allow(f"vote:{poll.id}:{ip}", limit=120, window_seconds=60):
+		if not rate_limiter.allow(f"vote-batch:{ip}", limit=VOTE_BATCH_RECORDS_PER_MINUTE, window_seconds=60, cost=len(items)):
 			raise HTTPException(status_code=429, detail="rate_limited")
-		option = session.exec(select(Option).where(Option.id == option_id, Option.poll_id == poll.id)).first()
-		if not option:
-			raise HTTPException(status_code=400, detail="invalid_option")
-		voter_id = get_or_set_voter_id(request, response)
-		existing_vote = session.exec(select(Vote).where(Vote.poll_id == poll.id, Vote.voter_id == voter_id)).first()
-		if existing_vote:
-			existing_vote.option_id = option.id
-		else:
-			session.add(Vote(poll_id=poll.id, option_id=option.id, voter_id=voter_id))
+		statuses: List[str] = ["invalid"] * len(items)
+		records: List[votes.BatchVote] = []
+		positions: List[int] = []
+		for i, item in enumerate(items):
+			record = _parse_batch_vote(item)
+			if record is not None:
+				records.append(record)
+				positions.append(i)
+		written, outcomes = votes.cast_votes_batch(session, records)
 		session.commit()
-		return {"status": "ok"}
+		_after_votes(outcomes)
+		for i, status in zip(positions, written):
+			statuses[i] = status
+		return {
+			"written": len(outcomes),
+			"results": [
+				{"index": i, "idempotency_key": item.get("idempotency_key") if isinstance(item, dict) else None, "status": status}
+				for i, (item, status) in enumerate(zip(items, statuses))
+			],
+		}
 
 	@app.get("/offline", response_class=HTMLResponse)
 	def offline(request: Request):
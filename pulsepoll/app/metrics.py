@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import timing
+
+
+LabelValues = Tuple[str, ...]
+Sample = Tuple[Dict[str, str], float]
+# (name, type, help, samples) produced by scrape-time collectors
+Family = Tuple[str, str, str, List[Sample]]
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+	return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+	parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+	if extra:
+		parts.append(extra)
+	return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+	if value == float("inf"):
+		return "+Inf"
+	return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(ABC):
+	kind = ""
+
+	def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+		self.name = name
+		self.help = help
+		self.labelnames = tuple(labelnames)
+		self._lock = threading.Lock()
+
+	def _key(self, labels: Dict[str, str]) -> LabelValues:
+		return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+	@abstractmethod
+	def render(self) -> List[str]:
+		"""Exposition lines (``# HELP``, ``# TYPE`` and samples) for this metric."""
+
+
+class Counter(_Metric):
+	kind = "counter"
+
+	def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+		super().__init__(name, help, labelnames)
+		# unlabelled series are exported from the start, so they read 0 rather than missing
+		self._values: Dict[LabelValues, float] = {} if self.labelnames else {(): 0.0}
+
+	def inc(self, amount: float = 1.0, **labels: str) -> None:
+		key = self._key(labels)
+		with self._lock:
+			self._values[key] = self._values.get(key, 0.0) + amount
+
+	def value(self, **labels: str) -> float:
+		return self._values.get(self._key(labels), 0.0)
+
+	def render(self) -> List[str]:
+		with self._lock:
+			items = list(self._values.items())
+		return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in items]
+
+
+class Gauge(Counter):
+	kind = "gauge"
+
+	def dec(self, amount: float = 1.0, **labels: str) -> None:
+		self.inc(-amount, **labels)
+
+	def set(self, value: float, **labels: str) -> None:
+		with self._lock:
+			self._values[self._key(labels)] = value
+
+	@contextmanager
+	def track(self, **labels: str) -> Iterator[None]:
+		"""Count something as in progress for the duration of the block."""
+		self.inc(**labels)
+		try:
+			yield
+		finally:
+			self.dec(**labels)
+
+
+class Histogram(_Metric):
+	kind = "histogram"
+
+	def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = ()) -> None:
+		super().__init__(name, help, labelnames)
+		self.buckets = tuple(sorted(buckets))
+		# per label set: [count per bucket (non-cumulative) + overflow, sum, count]
+		self._values: Dict[LabelValues, List] = {}
+
+	def observe(self, value: float, **labels: str) -> None:
+		key = self._key(labels)
+		index = bisect.bisect_left(self.buckets, value)
+		with self._lock:
+			state = self._values.get(key)
+			if state is None:
+				state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+			state[0][index] += 1
+			state[1] += value
+			state[2] += 1
+
+	def count(self, **labels: str) -> int:
+		state = self._values.get(self._key(labels))
+		return state[2] if state else 0
+
+	def render(self) -> List[str]:
+		with self._lock:
+			items = [(key, list(state[0]), state[1], state[2]) for key, state in self._values.items()]
+		lines = []
+		for key, counts, total, count in items:
+			cumulative = 0
+			for bound, n in zip(self.buckets + (float("inf"),), counts):
+				cumulative += n
+				le = 'le="' + _number(bound) + '"'
+				lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+			lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+			lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+		return lines
+
+
+class Registry:
+	"""Process-local metrics rendered in the Prometheus text exposition format.
+
+	Metrics updated on the hot path are registered once; values that already
+	live elsewhere (pool stats, cache counters) are read at scrape time by
+	collectors, so they cost nothing between scrapes.
+	"""
+
+	def __init__(self) -> None:
+		self._metrics: List[_Metric] = []
+		self._collectors: List[Callable[[], Iterable[Family]]] = []
+
+	def register(self, metric: _Metric) -> _Metric:
+		self._metrics.append(metric)
+		return metric
+
+	def add_collector(self, collector: Callable[[], Iterable[Family]]) -> None:
+		self._collectors.append(collector)
+
+	def render(self) -> str:
+		lines: List[str] = []
+		for metric in self._metrics:
+			lines.append(f"# HELP {metric.name} {metric.help}")
+			lines.append(f"# TYPE {metric.name} {metric.kind}")
+			lines.extend(metric.render())
+		for collector in self._collectors:
+			for name, kind, help, samples in collector():
+				lines.append(f"# HELP {name} {help}")
+				lines.append(f"# TYPE {name} {kind}")
+				for labels, value in samples:
+					lines.append(f"{name}{_labels(list(labels), list(labels.values()))} {_number(value)}")
+		return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+	"pulsepoll_http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status"),
+))
+http_request_duration = registry.register(Histogram(
+	"pulsepoll_http_request_duration_seconds", "HTTP request latency by route template (streams excluded).", ("method", "route"),
+	buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+))
+sse_connections = registry.register(Gauge("pulsepoll_sse_connections", "Open Server-Sent Events streams."))
+websocket_connections = registry.register(Gauge("pulsepoll_websocket_connections", "Open results WebSockets."))
+db_queries = registry.register(Counter("pulsepoll_db_queries_total", "SQL statements executed.", ("engine",)))
+db_query_duration = registry.register(Histogram(
+	"pulsepoll_db_query_duration_seconds", "SQL statement latency.", ("engine",),
+	buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+))
+db_pool_checkouts = registry.register(Counter("pulsepoll_db_pool_checkouts_total", "Connections checked out of the pool.", ("engine",)))
+
+_instrumented: Dict[int, str] = {}
+
+
+def instrument_engine(engine: Engine, name: str) -> None:
+	"""Count and time every statement and pool checkout on ``engine``; idempotent."""
+	if id(engine) in _instrumented:
+		return
+	_instrumented[id(engine)] = name
+
+	@event.listens_for(engine, "before_cursor_execute")
+	def _before(conn, cursor, statement, parameters, context, executemany):
+		conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+	@event.listens_for(engine, "after_cursor_execute")
+	def _after(conn, cursor, statement, parameters, context, executemany):
+		started = conn.info.get("query_started")
+		if not started:
+			return
+		elapsed = time.perf_counter() - started.pop()
+		db_queries.inc(engine=name)
+		db_query_duration.observe(elapsed, engine=name)
+		timing.record_query(elapsed)
+
+	@event.listens_for(engine, "handle_error")
+	def _error(context):
+		started = context.connection.info.get("query_started") if context.connection is not None else None
+		if started:
+			started.pop()
+
+	@event.listens_for(engine.pool, "checkout")
+	def _checkout(dbapi_connection, connection_record, connection_proxy):
+		db_pool_checkouts.inc(engine=name)
+
+
+def pool_families(engines: Dict[str, Engine]) -> List[Family]:
+	"""Scrape-time pool gauges for pools that expose them (QueuePool and friends)."""
+	checked_out: List[Sample] = []
+	overflow: List[Sample] = []
+	size: List[Sample] = []
+	for name, engine in engines.items():
+		pool = engine.pool
+		if hasattr(pool, "checkedout"):
+			checked_out.append(({"engine": name}, pool.checkedout()))
+		if hasattr(pool, "overflow"):
+			# QueuePool reports unused capacity as negative overflow
+			overflow.append(({"engine": name}, max(pool.overflow(), 0)))
+		if hasattr(pool, "size"):
+			size.append(({"engine": name}, pool.size()))
+	return [
+		("pulsepoll_db_pool_checked_out", "gauge", "Connections currently checked out.", checked_out),
+		("pulsepoll_db_pool_overflow", "gauge", "Connections open beyond the pool size.", overflow),
+		("pulsepoll_db_pool_size", "gauge", "Configured pool size.", size),
+	]
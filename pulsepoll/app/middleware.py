@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import logging
+import time
+from typing import Dict, Mapping, Optional
+
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import metrics, timing
+from .utils import detect_language
+
+
+logger = logging.getLogger(__name__)
+
+
+class _StreamingAwareGZipResponder(GZipResponder):
+	"""``GZipResponder`` that passes ``text/event-stream`` responses through untouched.
+
+	Gzipping an event stream buffers events inside the compressor, so clients
+	would only see them once enough had piled up.
+	"""
+
+	async def send_with_gzip(self, message: Message) -> None:
+		if message["type"] == "http.response.start":
+			content_type = Headers(raw=message.get("headers", [])).get("content-type", "")
+			if content_type.startswith("text/event-stream"):
+				# treated like an already-encoded body: headers and chunks go out as they come
+				self.initial_message = message
+				self.content_encoding_set = True
+				return
+		await super().send_with_gzip(message)
+
+
+class SelectiveGZipMiddleware(GZipMiddleware):
+	"""GZip middleware that leaves ``.gz`` resources and event streams alone."""
+
+	async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+		if scope["type"] != "http" or scope["path"].endswith(".gz") or "gzip" not in Headers(scope=scope).get("accept-encoding", ""):
+			await self.app(scope, receive, send)
+			return
+		responder = _StreamingAwareGZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel)
+		await responder(scope, receive, send)
+
+
+class SecurityHeadersMiddleware:
+	"""Pure ASGI middleware adding security headers and the ``lang`` cookie.
+
+	Header tuples are encoded once; a header the response already sets (the
+	embed page's ``X-Frame-Options``/CSP) is left alone. HSTS is only sent
+	over https, and the ``lang`` cookie only on HTML responses to clients that
+	do not have one yet. Only ``http.response.start`` is touched, so streamed
+	bodies pass straight through.
+	"""
+
+	def __init__(self, app: ASGIApp, headers: Mapping[str, str], hsts: Optional[str] = None, lang_max_age: int = 60 * 60 * 24 * 365) -> None:
+		self.app = app
+		self.headers = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers.items()]
+		self.hsts = (b"strict-transport-security", hsts.encode("latin-1")) if hsts else None
+		self.lang_max_age = lang_max_age
+		self._lang_cookies: Dict[str, bytes] = {}
+
+	async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+		if scope["type"] != "http":
+			await self.app(scope, receive, send)
+			return
+		extra = self.headers + [self.hsts] if self.hsts is not None and scope.get("scheme") == "https" else self.headers
+
+		async def send_wrapper(message: Message) -> None:
+			if message["type"] == "http.response.start":
+				headers = list(message.get("headers", ()))
+				present = {name.lower() for name, _ in headers}
+				headers.extend(header for header in extra if header[0] not in present)
+				if _is_html(headers):
+					cookie = self._lang_cookie(scope)
+					if cookie is not None:
+						headers.append((b"set-cookie", cookie))
+				message = {**message, "headers": headers}
+			await send(message)
+
+		await self.app(scope, receive, send_wrapper)
+
+	def _lang_cookie(self, scope: Scope) -> Optional[bytes]:
+		conn = HTTPConnection(scope)
+		if conn.cookies.get("lang"):
+			return None
+		lang = detect_language(conn)
+		cookie = self._lang_cookies.get(lang)
+		if cookie is None:
+			cookie = self._lang_cookies[lang] = f"lang={lang}; Max-Age={self.lang_max_age}; Path=/; SameSite=lax".encode("latin-1")
+		return cookie
+
+
+def _is_html(headers) -> bool:
+	for name, value in headers:
+		if name.lower() == b"content-type":
+			return value.startswith(b"text/html")
+	return False
+
+
+class MetricsMiddleware:
+	"""Pure ASGI middleware recording request counts and latency per route template.
+
+	The route is read from the scope after routing (FastAPI stores the matched
+	route there), so ``/p/{code}/vote`` is one series however many polls exist.
+	Event streams are counted but kept out of the latency histogram, since
+	their duration is the connection lifetime.
+	"""
+
+	def __init__(self, app: ASGIApp) -> None:
+		self.app = app
+
+	async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+		if scope["type"] != "http":
+			await self.app(scope, receive, send)
+			return
+		started = time.perf_counter()
+		status = 500
+		streaming = False
+
+		async def send_wrapper(message: Message) -> None:
+			nonlocal status, streaming
+			if message["type"] == "http.response.start":
+				status = message["status"]
+				for name, value in message.get("headers", ()):
+					if name.lower() == b"content-type" and value.startswith(b"text/event-stream"):
+						streaming = True
+			await send(message)
+
+		try:
+			await self.app(scope, receive, send_wrapper)
+		finally:
+			route = scope.get("route")
+			path = getattr(route, "path", None) or ("<unmatched>" if status == 404 else "<other>")
+			method = scope["method"]
+			metrics.http_requests.inc(method=method, route=path, status=str(status))
+			if not streaming:
+				metrics.http_request_duration.observe(time.perf_counter() - started, method=method, route=path)
+
+
+class ServerTimingMiddleware:
+	"""Pure ASGI middleware reporting where each request spent its time.
+
+	A ``RequestTiming`` is put in a context variable for the request, so SQL
+	statements (engine events) and template renders running in the threadpool
+	are attributed to it. When the response starts, its totals go out as a
+	``Server-Timing`` header (``db`` with the statement count, ``render``,
+	``app``). Requests slower than ``slow_ms`` or running more than
+	``max_queries`` statements (a likely N+1) are logged as warnings.
+	"""
+
+	def __init__(self, app: ASGIApp, header: bool = True, slow_ms: Optional[float] = None, max_queries: Optional[int] = None) -> None:
+		self.app = app
+		self.header = header
+		self.slow_ms = slow_ms
+		self.max_queries = max_queries
+
+	async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+		if scope["type"] != "http":
+			await self.app(scope, receive, send)
+			return
+		request_timing = timing.RequestTiming()
+		token = timing.current.set(request_timing)
+
+		async def send_wrapper(message: Message) -> None:
+			if message["type"] == "http.response.start":
+				total = request_timing.elapsed()
+				if self.header:
+					headers = list(message.get("headers", ()))
+					headers.append((b"server-timing", request_timing.header(total).encode("latin-1")))
+					message = {**message, "headers": headers}
+				self._check_budget(scope, message["status"], request_timing, total)
+			await send(message)
+
+		try:
+			await self.app(scope, receive, send_wrapper)
+		finally:
+			timing.current.reset(token)
+
+	def _check_budget(self, scope: Scope, status: int, request_timing: timing.RequestTiming, total: float) -> None:
+		too_slow = self.slow_ms is not None and total * 1000 > self.slow_ms
+		too_many = self.max_queries is not None and request_timing.queries > self.max_queries
+		if not (too_slow or too_many):
+			return
+		route = getattr(scope.get("route"), "path", scope["path"])
+		logger.warning(
+			"%s request %s %s -> %s in %.1fms: %d queries (%.1fms db), %.1fms render",
+			"slow" if too_slow else "query-heavy",
+			scope["method"],
+			route,
+			status,
+			total * 1000,
+			request_timing.queries,
+			request_timing.db_seconds * 1000,
+			request_timing.render_seconds * 1000,
+		)
@@ -1,8 +1,7 @@
-from __future__ import annotations
-
 import datetime as dt
 from typing import List, Optional
 
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel, Relationship
 
 
@@ -27,6 +26,8 @@ class Option(SQLModel, table=True):
 
 
 class Vote(SQLModel, table=True):
+	__table_args__ = (Index("uq_vote_poll_voter", "poll_id", "voter_id", unique=True),)
+
 	id: Optional[int] = Field(default=None, primary_key=True)
 	poll_id: int = Field(index=True, foreign_key="poll.id")
 	option_id: int = Field(index=True, foreign_key="option.id")
@@ -34,4 +35,27 @@ class Vote(SQLModel, table=True):
 	created_at: dt.datetime = Field(default_factory=lambda: dt.datetime.utcnow())
 
 	poll: Optional[Poll] = Relationship(back_populates="votes")
-	option: Optional[Option] = Relationship(back_populates="votes")
\ No newline at end of file
+	option: Optional[Option] = Relationship(back_populates="votes")
+
+
+class OptionCount(SQLModel, table=True):
+	"""Materialized vote tally per option, maintained on the vote write path."""
+
+	poll_id: int = Field(primary_key=True, foreign_key="poll.id")
+	option_id: int = Field(primary_key=True, foreign_key="option.id")
+	count: int = Field(default=0)
+
+
+class ResultsVersion(SQLModel, table=True):
+	"""Monotonic per-poll results version, bumped whenever the poll's tally changes."""
+
+	poll_id: int = Field(primary_key=True, foreign_key="poll.id")
+	version: int = Field(default=0)
+
+
+class ShortCodeSequence(SQLModel, table=True):
+	"""Id counter and permutation key behind poll short codes (a single row)."""
+
+	id: int = Field(default=1, primary_key=True)
+	next_id: int = Field(default=1)
+	key: str
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import datetime as dt
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+
+from .models import Option, Poll
+from .shortcode import ShortCodeAllocator, ShortCodeUnavailable
+
+
+@dataclass(frozen=True)
+class NewPoll:
+	question: str
+	options: Tuple[str, ...]
+	locale: Optional[str] = None
+
+
+def create_polls(session: Session, polls: Sequence[NewPoll], codes: ShortCodeAllocator, attempts: int = 5) -> List[Tuple[int, str]]:
+	"""Insert polls and all their options in one transaction and commit.
+
+	Polls go out in one multi-row ``INSERT ... RETURNING`` and options in one
+	executemany ``INSERT``, so a poll is never visible without its options.
+	A short-code collision, which only codes older than the allocator can
+	cause, retries the whole transaction with fresh codes, raising
+	``ShortCodeUnavailable`` once ``attempts`` run out. Returns
+	``(poll_id, code)`` in input order.
+	"""
+	for _ in range(attempts):
+		now = dt.datetime.utcnow()
+		rows = [{"code": codes.allocate(), "question": p.question, "locale": p.locale, "created_at": now} for p in polls]
+		try:
+			# rows may come back in any order (SQLite cannot promise one for a batch), so match them by code
+			ids = {code: poll_id for poll_id, code in session.execute(insert(Poll).returning(Poll.id, Poll.code), rows)}
+			created = [(ids[row["code"]], row["code"]) for row in rows]
+			session.execute(
+				insert(Option),
+				[{"poll_id": poll_id, "text": text} for (poll_id, _), p in zip(created, polls) for text in p.options],
+			)
+			session.commit()
+		except IntegrityError:
+			session.rollback()
+			continue
+		return created
+	raise ShortCodeUnavailable("could not allocate unique short codes")
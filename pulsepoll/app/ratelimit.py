@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Union
+
+from .utils import SlidingWindowRateLimiter
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_limit (
+	key TEXT PRIMARY KEY,
+	window INTEGER NOT NULL,
+	bucket INTEGER NOT NULL,
+	previous INTEGER NOT NULL,
+	current INTEGER NOT NULL,
+	touched REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS rate_limit_touched ON rate_limit (touched);
+"""
+
+
+class SQLiteRateLimiter:
+	"""Sliding-window rate limiter whose counters live in a local SQLite file.
+
+	All worker processes on a host that point at the same file share one set of
+	counters, so limits no longer scale with the number of workers. Each check
+	is a single ``BEGIN IMMEDIATE`` transaction, which SQLite serializes across
+	processes. The file holds throwaway state, so it runs with WAL and
+	``synchronous=OFF``. Expired keys are deleted every ``sweep_every`` checks
+	and the oldest keys beyond ``max_keys`` are dropped at the same time.
+	"""
+
+	def __init__(self, path: str, max_keys: int = 100_000, sweep_every: int = 1000) -> None:
+		self.path = path
+		self.max_keys = max_keys
+		self.sweep_every = sweep_every
+		self._local = threading.local()
+		self._checks = 0
+		self.rejected = 0
+		self.evicted_expired = 0
+		self.evicted_capacity = 0
+		with self._connect() as conn:
+			conn.executescript(_SCHEMA)
+
+	def _connect(self) -> sqlite3.Connection:
+		conn = getattr(self._local, "conn", None)
+		if conn is None:
+			conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+			conn.execute("PRAGMA journal_mode=WAL")
+			conn.execute("PRAGMA synchronous=OFF")
+			self._local.conn = conn
+		return conn
+
+	def allow(self, key: str, limit: int, window_seconds: int, cost: int = 1) -> bool:
+		now = time.time()
+		bucket = int(now // window_seconds)
+		conn = self._connect()
+		conn.execute("BEGIN IMMEDIATE")
+		try:
+			row = conn.execute("SELECT bucket, previous, current FROM rate_limit WHERE key = ?", (key,)).fetchone()
+			previous, current = 0, 0
+			if row is not None:
+				if row[0] == bucket:
+					previous, current = row[1], row[2]
+				elif bucket - row[0] == 1:
+					previous = row[2]
+			overlap = 1.0 - (now % window_seconds) / window_seconds
+			allowed = previous * overlap + current + (cost - 1) < limit
+			if allowed:
+				current += cost
+			conn.execute(
+				"INSERT INTO rate_limit (key, window, bucket, previous, current, touched) VALUES (?, ?, ?, ?, ?, ?) "
+				"ON CONFLICT(key) DO UPDATE SET window = excluded.window, bucket = excluded.bucket, "
+				"previous = excluded.previous, current = excluded.current, touched = excluded.touched",
+				(key, window_seconds, bucket, previous, current, now),
+			)
+			self._checks += 1
+			if self._checks % self.sweep_every == 0:
+				self._sweep(conn, now)
+			conn.execute("COMMIT")
+		except BaseException:
+			conn.execute("ROLLBACK")
+			raise
+		if not allowed:
+			self.rejected += 1
+		return allowed
+
+	def _sweep(self, conn: sqlite3.Connection, now: float) -> None:
+		self.evicted_expired += conn.execute("DELETE FROM rate_limit WHERE touched < ? - 2 * window", (now,)).rowcount
+		excess = conn.execute("SELECT count(*) FROM rate_limit").fetchone()[0] - self.max_keys
+		if excess > 0:
+			self.evicted_capacity += conn.execute(
+				"DELETE FROM rate_limit WHERE key IN (SELECT key FROM rate_limit ORDER BY touched LIMIT ?)", (excess,)
+			).rowcount
+
+	def __len__(self) -> int:
+		return self._connect().execute("SELECT count(*) FROM rate_limit").fetchone()[0]
+
+	def stats(self) -> Dict[str, int]:
+		return {
+			"keys": len(self),
+			"max_keys": self.max_keys,
+			"approx_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+			"rejected": self.rejected,
+			"evicted_expired": self.evicted_expired,
+			"evicted_capacity": self.evicted_capacity,
+		}
+
+
+RateLimiter = Union[SlidingWindowRateLimiter, SQLiteRateLimiter]
+
+
+def build_rate_limiter(backend: Optional[str] = None, path: Optional[str] = None) -> RateLimiter:
+	"""Build the limiter selected by ``RATE_LIMIT_BACKEND`` (``memory`` by default, or ``sqlite``)."""
+	backend = backend or os.environ.get("RATE_LIMIT_BACKEND", "memory")
+	if backend == "memory":
+		return SlidingWindowRateLimiter()
+	if backend == "sqlite":
+		return SQLiteRateLimiter(path or os.environ.get("RATE_LIMIT_PATH", "./pulsepoll-ratelimit.db"))
+	raise ValueError(f"unknown RATE_LIMIT_BACKEND: {backend}")
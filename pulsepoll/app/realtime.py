@@ -0,0 +1,289 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+
+def _dumps(obj: object) -> str:
+	return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+class ResultsUpdate:
+	"""One published change of a poll's results.
+
+	Wire encodings are computed lazily and at most once per update, then shared
+	by every subscriber, so fan-out cost does not include per-connection
+	serialization.
+	"""
+
+	__slots__ = ("payload", "previous", "_snapshot", "_delta")
+
+	def __init__(self, previous: Optional[Dict[str, Any]], payload: Dict[str, Any]) -> None:
+		self.previous = previous
+		self.payload = payload
+		self._snapshot: Optional[str] = None
+		self._delta: Optional[str] = None
+
+	@property
+	def version(self) -> int:
+		return self.payload.get("version", 0)
+
+	@property
+	def previous_version(self) -> Optional[int]:
+		return self.previous.get("version", 0) if self.previous is not None else None
+
+	def snapshot_message(self) -> str:
+		if self._snapshot is None:
+			self._snapshot = _dumps({"type": "snapshot", "seq": self.version, **self.payload})
+		return self._snapshot
+
+	def changes(self) -> List[List[int]]:
+		"""``[option_id, count]`` pairs that differ from the previous update."""
+		before = {o["id"]: o["count"] for o in self.previous["options"]} if self.previous else {}
+		return [[o["id"], o["count"]] for o in self.payload["options"] if before.get(o["id"]) != o["count"]]
+
+	def delta_message(self) -> Optional[str]:
+		"""Encoded delta against the previous update, or None when there is none."""
+		if self.previous is None:
+			return None
+		if self._delta is None:
+			self._delta = _dumps({
+				"type": "delta",
+				"seq": self.version,
+				"prev": self.previous_version,
+				"total": self.payload["total"],
+				"changes": self.changes(),
+			})
+		return self._delta
+
+	def message_for(self, seq: Optional[int]) -> Optional[str]:
+		"""What to send a client holding version ``seq``: a delta, a snapshot, or None if stale."""
+		if seq is None:
+			return self.snapshot_message()
+		if self.version <= seq:
+			return None
+		# a delta only applies on top of the exact version the client holds
+		if self.previous_version == seq:
+			return self.delta_message()
+		return self.snapshot_message()
+
+	def buffered(self) -> BufferedDelta:
+		return BufferedDelta(self.version, self.previous_version, self.delta_message())
+
+
+class BufferedDelta:
+	"""What the history keeps of a ``ResultsUpdate``: its versions and encoded delta, not the payload."""
+
+	__slots__ = ("version", "previous_version", "_delta")
+
+	def __init__(self, version: int, previous_version: Optional[int], delta: Optional[str]) -> None:
+		self.version = version
+		self.previous_version = previous_version
+		self._delta = delta
+
+	def delta_message(self) -> Optional[str]:
+		return self._delta
+
+
+def replay_since(updates: List[BufferedDelta], seq: int) -> Optional[List[BufferedDelta]]:
+	"""Updates that bring a client from version ``seq`` to the newest buffered one.
+
+	Returns None when the buffer no longer reaches back to ``seq`` and the
+	client needs a full snapshot instead.
+	"""
+	missed = [u for u in updates if u.version > seq]
+	if not missed:
+		return [] if updates and updates[-1].version == seq else None
+	expected = seq
+	for update in missed:
+		if update.previous_version != expected:
+			return None
+		expected = update.version
+	return missed
+
+
+class _Channel:
+	__slots__ = ("poll_id", "subscribers", "wake", "task", "last", "loaded", "loop")
+
+	def __init__(self, poll_id: int, loop: asyncio.AbstractEventLoop) -> None:
+		self.poll_id = poll_id
+		self.subscribers: Set[asyncio.Queue] = set()
+		self.wake = asyncio.Event()
+		self.task: Optional[asyncio.Task] = None
+		self.last: object = None
+		self.loaded = False
+		self.loop = loop
+
+
+class _History:
+	__slots__ = ("payload", "updates")
+
+	def __init__(self, size: int) -> None:
+		self.payload: object = None
+		self.updates: deque = deque(maxlen=size)
+
+
+class ResultsHub:
+	"""Fans out live poll results to SSE and WebSocket subscribers.
+
+	Each poll with at least one subscriber gets a single pump task that reloads
+	the results once per tick (or as soon as a vote is reported through
+	``notify``) and pushes changed payloads to every subscriber's bounded queue.
+	The loader runs in the threadpool and is expected to open and close its own
+	short-lived session, so idle subscribers hold no database resources. A
+	failing load is logged and retried on later ticks, backing off up to
+	``max_backoff`` seconds while it keeps failing.
+
+	The last ``history_size`` updates of up to ``history_polls`` polls are kept
+	after their subscribers leave, so reconnecting clients can be sent only
+	what they missed (see ``history``). ``compact`` reduces each update to what
+	the history stores (e.g. ``ResultsUpdate.buffered``); reloads that only
+	repeat the remembered payload are not recorded.
+	"""
+
+	def __init__(
+		self,
+		loader: Callable[[int], object],
+		interval: float = 2.0,
+		queue_size: int = 8,
+		wrap: Optional[Callable[[object, object], object]] = None,
+		history_size: int = 32,
+		history_polls: int = 1_000,
+		max_backoff: float = 30.0,
+		compact: Optional[Callable[[object], object]] = None,
+	) -> None:
+		self._loader = loader
+		# wrap(previous_payload, payload) builds what subscribers receive, once per change
+		self._wrap = wrap or (lambda previous, payload: payload)
+		self.interval = interval
+		self.queue_size = queue_size
+		self.max_backoff = max_backoff
+		self._channels: Dict[int, _Channel] = {}
+		self._loop: Optional[asyncio.AbstractEventLoop] = None
+		self.history_size = history_size
+		self.history_polls = history_polls
+		self._compact = compact or (lambda update: update)
+		self._history: "OrderedDict[int, _History]" = OrderedDict()
+
+	@asynccontextmanager
+	async def subscribe(self, poll_id: int) -> AsyncIterator[asyncio.Queue]:
+		loop = asyncio.get_running_loop()
+		self._loop = loop
+		channel = self._channels.get(poll_id)
+		if channel is None or channel.loop is not loop:
+			channel = _Channel(poll_id, loop)
+			record = self._history.get(poll_id)
+			if record is not None:
+				# continue the update chain where the previous channel left off
+				channel.last = record.payload
+			self._channels[poll_id] = channel
+		queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+		channel.subscribers.add(queue)
+		if channel.loaded:
+			queue.put_nowait(self._wrap(None, channel.last))
+		if channel.task is None or channel.task.done():
+			channel.wake.set()
+			channel.task = asyncio.create_task(self._pump(channel))
+		try:
+			yield queue
+		finally:
+			channel.subscribers.discard(queue)
+			if not channel.subscribers:
+				channel.wake.set()
+
+	def notify(self, poll_id: int) -> None:
+		"""Ask the pump for ``poll_id`` to reload now; safe to call from worker threads."""
+		channel = self._channels.get(poll_id)
+		loop = self._loop
+		if channel is None or loop is None or loop.is_closed():
+			return
+		try:
+			if asyncio.get_running_loop() is loop:
+				channel.wake.set()
+				return
+		except RuntimeError:
+			pass
+		loop.call_soon_threadsafe(channel.wake.set)
+
+	def history(self, poll_id: int) -> List[object]:
+		"""Recently published updates for ``poll_id``, oldest first."""
+		record = self._history.get(poll_id)
+		return list(record.updates) if record is not None else []
+
+	def subscriber_count(self, poll_id: Optional[int] = None) -> int:
+		if poll_id is not None:
+			channel = self._channels.get(poll_id)
+			return len(channel.subscribers) if channel else 0
+		return sum(len(c.subscribers) for c in self._channels.values())
+
+	async def close(self) -> None:
+		tasks = [c.task for c in self._channels.values() if c.task is not None]
+		for task in tasks:
+			task.cancel()
+		await asyncio.gather(*tasks, return_exceptions=True)
+		self._channels.clear()
+
+	async def _pump(self, channel: _Channel) -> None:
+		failures = 0
+		try:
+			while channel.subscribers:
+				timeout = self.interval
+				if failures:
+					timeout = min(self.interval * 2 ** failures, max(self.max_backoff, self.interval))
+				try:
+					await asyncio.wait_for(channel.wake.wait(), timeout=timeout)
+				except asyncio.TimeoutError:
+					pass
+				channel.wake.clear()
+				if not channel.subscribers:
+					break
+				try:
+					payload = await run_in_threadpool(self._loader, channel.poll_id)
+				except Exception:
+					failures += 1
+					logger.exception("loading results for poll %s failed (%d in a row)", channel.poll_id, failures)
+					continue
+				failures = 0
+				# the first load always goes out so new subscribers get a snapshot
+				if payload is None or (channel.loaded and payload == channel.last):
+					continue
+				update = self._wrap(channel.last, payload)
+				# a new channel's first load often repeats the remembered payload; that is no change to record
+				if payload != channel.last:
+					self._remember(channel.poll_id, payload, update)
+				channel.last = payload
+				channel.loaded = True
+				for queue in list(channel.subscribers):
+					self._offer(queue, update)
+		finally:
+			if not channel.subscribers and self._channels.get(channel.poll_id) is channel:
+				del self._channels[channel.poll_id]
+
+	def _remember(self, poll_id: int, payload: object, update: object) -> None:
+		record = self._history.get(poll_id)
+		if record is None:
+			record = self._history[poll_id] = _History(self.history_size)
+			while len(self._history) > self.history_polls:
+				self._history.popitem(last=False)
+		else:
+			self._history.move_to_end(poll_id)
+		record.payload = payload
+		record.updates.append(self._compact(update))
+
+	@staticmethod
+	def _offer(queue: asyncio.Queue, payload: object) -> None:
+		# slow consumers only ever need the latest results, so drop the oldest
+		if queue.full():
+			try:
+				queue.get_nowait()
+			except asyncio.QueueEmpty:
+				pass
+		queue.put_nowait(payload)
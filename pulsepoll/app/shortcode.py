@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import hashlib
+import secrets
+import string
+import threading
+from typing import Optional
+
+from sqlalchemy import update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+
+from .models import ShortCodeSequence
+
+
+BASE62_ALPHABET = string.digits + string.ascii_lowercase + string.ascii_uppercase
+_BASE62_INDEX = {ch: i for i, ch in enumerate(BASE62_ALPHABET)}
+
+
+class ShortCodeUnavailable(RuntimeError):
+	"""No short code could be handed out: the code space is used up or inserts kept colliding."""
+
+
+class FeistelPermutation:
+	"""Keyed bijection on ``[0, size)``.
+
+	A balanced Feistel network permutes the smallest even-width power of two
+	that covers ``size``; values that land outside the range are encrypted
+	again (cycle walking) until they fall inside it, which keeps the mapping a
+	bijection on ``[0, size)``. The domain is at most 4x larger than the range,
+	so walks are short.
+	"""
+
+	def __init__(self, key: bytes, size: int, rounds: int = 4) -> None:
+		self.size = size
+		self.rounds = rounds
+		self._key = hashlib.sha256(key).digest()
+		bits = max((size - 1).bit_length(), 2)
+		self._half = (bits + 1) // 2
+		self._mask = (1 << self._half) - 1
+
+	def _f(self, round_: int, value: int) -> int:
+		digest = hashlib.blake2b(value.to_bytes(8, "big"), key=self._key, digest_size=8, salt=round_.to_bytes(16, "big")).digest()
+		return int.from_bytes(digest, "big") & self._mask
+
+	def _encrypt(self, value: int) -> int:
+		left, right = value >> self._half, value & self._mask
+		for round_ in range(self.rounds):
+			left, right = right, left ^ self._f(round_, right)
+		return (left << self._half) | right
+
+	def _decrypt(self, value: int) -> int:
+		left, right = value >> self._half, value & self._mask
+		for round_ in reversed(range(self.rounds)):
+			left, right = right ^ self._f(round_, left), left
+		return (left << self._half) | right
+
+	def forward(self, value: int) -> int:
+		if not 0 <= value < self.size:
+			raise ValueError("value out of range")
+		value = self._encrypt(value)
+		while value >= self.size:
+			value = self._encrypt(value)
+		return value
+
+	def inverse(self, value: int) -> int:
+		if not 0 <= value < self.size:
+			raise ValueError("value out of range")
+		value = self._decrypt(value)
+		while value >= self.size:
+			value = self._decrypt(value)
+		return value
+
+
+class ShortCodeAllocator:
+	"""Hands out unique poll short codes without looking them up first.
+
+	Sequential ids are mapped through a keyed ``FeistelPermutation`` onto the
+	62**length base62 codes, so distinct ids always give distinct codes that
+	still look random. Each process reserves ``block_size`` ids at a time with
+	one atomic ``UPDATE ... RETURNING`` on ``ShortCodeSequence`` and allocates
+	from the block in memory; ids left in a block when a process exits are
+	simply skipped. The key comes from ``SHORT_CODE_KEY`` or, when unset, is
+	generated once and stored next to the counter. Changing the key later, or
+	codes created before the allocator existed, can collide with new codes,
+	so callers still retry on the unique constraint.
+	"""
+
+	def __init__(self, engine: Engine, key: Optional[str] = None, block_size: int = 100, length: int = 7) -> None:
+		self._engine = engine
+		self._key = key
+		self.block_size = block_size
+		self.length = length
+		self._permutation: Optional[FeistelPermutation] = None
+		self._next = 0
+		self._end = 0
+		self._lock = threading.Lock()
+
+	def allocate(self) -> str:
+		with self._lock:
+			if self._next >= self._end:
+				self._next = self._reserve()
+				self._end = self._next + self.block_size
+			value = self._next
+			self._next += 1
+		return self.code_for(value)
+
+	def code_for(self, value: int) -> str:
+		permuted = self._get_permutation().forward(value)
+		chars = []
+		for _ in range(self.length):
+			permuted, digit = divmod(permuted, 62)
+			chars.append(BASE62_ALPHABET[digit])
+		return "".join(reversed(chars))
+
+	def id_for(self, code: str) -> Optional[int]:
+		"""Inverse of ``code_for``; None for strings that are not codes of this length."""
+		if len(code) != self.length or any(ch not in _BASE62_INDEX for ch in code):
+			return None
+		value = 0
+		for ch in code:
+			value = value * 62 + _BASE62_INDEX[ch]
+		return self._get_permutation().inverse(value)
+
+	def _get_permutation(self) -> FeistelPermutation:
+		if self._permutation is None:
+			key = self._key or self._load_row().key
+			self._permutation = FeistelPermutation(key.encode("utf-8"), 62 ** self.length)
+		return self._permutation
+
+	def _load_row(self) -> ShortCodeSequence:
+		with Session(self._engine) as session:
+			row = session.get(ShortCodeSequence, 1)
+			if row is not None:
+				return row
+			session.add(ShortCodeSequence(id=1, next_id=1, key=secrets.token_hex(16)))
+			try:
+				session.commit()
+			except IntegrityError:
+				# another worker created the row first
+				session.rollback()
+			return session.get(ShortCodeSequence, 1)
+
+	def _reserve(self) -> int:
+		stmt = (
+			update(ShortCodeSequence)
+			.where(ShortCodeSequence.id == 1)
+			.values(next_id=ShortCodeSequence.next_id + self.block_size)
+			.returning(ShortCodeSequence.next_id)
+		)
+		while True:
+			with Session(self._engine) as session:
+				end = session.exec(stmt).scalar_one_or_none()
+				session.commit()
+			if end is not None:
+				break
+			self._load_row()
+		if end > 62 ** self.length:
+			raise ShortCodeUnavailable("short code space exhausted")
+		return end - self.block_size
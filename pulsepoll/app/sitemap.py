@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import os
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from .models import Poll
+
+
+_XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+_URLSET_OPEN = '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+_INDEX_OPEN = '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+
+PAGES_SHARD = "pages"
+
+
+class SitemapFile:
+	__slots__ = ("path", "etag", "mtime")
+
+	def __init__(self, path: str, etag: str, mtime: float) -> None:
+		self.path = path
+		self.etag = etag
+		self.mtime = mtime
+
+	@property
+	def last_modified(self) -> str:
+		return formatdate(self.mtime, usegmt=True)
+
+
+class SitemapStore:
+	"""Gzipped sitemap shards on disk, regenerated in the background as polls are created.
+
+	Shard ``n`` lists the polls with ids in ``(n * shard_size, (n + 1) * shard_size]``
+	so creating a poll only dirties the shard holding its id. ``mark_dirty``
+	wakes a writer thread that waits ``debounce`` seconds to coalesce bursts,
+	then rewrites the dirty shards atomically. ETags come from file size and
+	mtime, so they survive restarts without extra bookkeeping. URLs use the
+	configured ``base_url`` only, never a request's ``Host``.
+	"""
+
+	def __init__(
+		self, engine: Engine, directory: str, base_url: str, shard_size: int = 50_000, debounce: float = 5.0, index_ttl: float = 60.0
+	) -> None:
+		self._engine = engine
+		self.directory = directory
+		self.base_url = base_url.rstrip("/")
+		self.shard_size = shard_size
+		self.debounce = debounce
+		self._dirty: Set[int] = set()
+		self._resync = False
+		self._max_id = 0
+		self._index: Optional[Tuple[bytes, str, float]] = None
+		self._index_built = 0.0
+		self.index_ttl = index_ttl
+		self._cond = threading.Condition()
+		self._thread: Optional[threading.Thread] = None
+		self._write_lock = threading.Lock()
+
+	def shard_of(self, poll_id: int) -> int:
+		return (poll_id - 1) // self.shard_size
+
+	def shard_count(self) -> int:
+		return self.shard_of(self._max_id) + 1 if self._max_id else 0
+
+	def _path(self, name: object) -> str:
+		return os.path.join(self.directory, f"{name}.xml.gz")
+
+	def start(self) -> None:
+		"""Bring the shards on disk up to date in the background writer.
+
+		Shards an earlier process wrote for the same base URL are reused; only
+		missing shards and the newest one (which may have gained polls) are
+		rewritten. A changed base URL rewrites them all.
+		"""
+		with self._cond:
+			self._resync = True
+			self._wake()
+
+	def _sync(self) -> None:
+		os.makedirs(self.directory, exist_ok=True)
+		marker = os.path.join(self.directory, "base_url")
+		try:
+			with open(marker, encoding="utf-8") as fh:
+				reuse = fh.read() == self.base_url
+		except FileNotFoundError:
+			reuse = False
+		with Session(self._engine) as session:
+			self._max_id = max(self._max_id, session.exec(select(func.max(Poll.id))).one() or 0)
+		count = self.shard_count()
+		self._write_pages()
+		for shard in range(count):
+			if not reuse or shard == count - 1 or not os.path.exists(self._path(shard)):
+				self._write_shard(shard)
+		with open(marker, "w", encoding="utf-8") as fh:
+			fh.write(self.base_url)
+		self._index = None
+
+	def mark_dirty(self, poll_id: int) -> None:
+		with self._cond:
+			self._max_id = max(self._max_id, poll_id)
+			self._dirty.add(self.shard_of(poll_id))
+			self._index = None
+			self._wake()
+
+	def _wake(self) -> None:
+		# caller holds self._cond
+		if self._thread is None or not self._thread.is_alive():
+			self._thread = threading.Thread(target=self._run, name="sitemap-writer", daemon=True)
+			self._thread.start()
+		self._cond.notify()
+
+	def flush(self) -> None:
+		"""Synchronously write any dirty shards (used by tests and on shutdown)."""
+		with self._cond:
+			dirty, self._dirty = self._dirty, set()
+		for shard in sorted(dirty):
+			self._write_shard(shard)
+		if dirty:
+			self._index = None
+
+	def shard_file(self, name: str) -> Optional[SitemapFile]:
+		if name != PAGES_SHARD:
+			if not name.isdigit() or int(name) >= self.shard_count():
+				return None
+		# a shard the writer has not produced yet is simply not there
+		return self._stat(self._path(name))
+
+	def index(self) -> Tuple[bytes, str, float]:
+		"""Return ``(xml, etag, mtime)`` for the sitemap index, rebuilt only after shards change."""
+		cached = self._index
+		if cached is not None and time.monotonic() - self._index_built < self.index_ttl:
+			return cached
+		# other workers may have created polls in shards this process has not seen
+		with Session(self._engine) as session:
+			self._max_id = max(self._max_id, session.exec(select(func.max(Poll.id))).one() or 0)
+		names: List[str] = [PAGES_SHARD] + [str(n) for n in range(self.shard_count())]
+		entries = []
+		digest = hashlib.sha1()
+		newest = 0.0
+		for name in names:
+			info = self._stat(self._path(name))
+			mtime = info.mtime if info else time.time()
+			newest = max(newest, mtime)
+			digest.update((info.etag if info else name).encode())
+			lastmod = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(mtime))
+			entries.append(f"<sitemap><loc>{self.base_url}/sitemaps/{name}.xml.gz</loc><lastmod>{lastmod}</lastmod></sitemap>")
+		xml = (_XML_HEADER + _INDEX_OPEN + "".join(entries) + "</sitemapindex>").encode("utf-8")
+		self._index = (xml, f'"{digest.hexdigest()}"', newest)
+		self._index_built = time.monotonic()
+		return self._index
+
+	def _run(self) -> None:
+		while True:
+			with self._cond:
+				while not self._dirty and not self._resync:
+					self._cond.wait()
+				resync, self._resync = self._resync, False
+			if resync:
+				self._sync()
+				continue
+			time.sleep(self.debounce)
+			self.flush()
+
+	def _write_pages(self) -> None:
+		urls = [f"{self.base_url}/", f"{self.base_url}/trending"]
+		self._write(self._path(PAGES_SHARD), (f"<url><loc>{u}</loc></url>" for u in urls))
+
+	def _write_shard(self, shard: int) -> None:
+		low, high = shard * self.shard_size, (shard + 1) * self.shard_size
+		with Session(self._engine) as session:
+			codes = session.exec(
+				select(Poll.code).where(Poll.id > low, Poll.id <= high).order_by(Poll.id).execution_options(yield_per=5000)
+			)
+			self._write(self._path(shard), (f"<url><loc>{self.base_url}/p/{code}</loc></url>" for code in codes))
+
+	def _write(self, path: str, urls: Iterable[str]) -> None:
+		tmp = f"{path}.{os.getpid()}.tmp"
+		with self._write_lock:
+			with gzip.open(tmp, "wt", encoding="utf-8") as fh:
+				fh.write(_XML_HEADER + _URLSET_OPEN)
+				for url in urls:
+					fh.write(url)
+				fh.write("</urlset>")
+			os.replace(tmp, path)
+
+	@staticmethod
+	def _stat(path: str) -> Optional[SitemapFile]:
+		try:
+			st = os.stat(path)
+		except FileNotFoundError:
+			return None
+		return SitemapFile(path, f'"{st.st_size:x}-{st.st_mtime_ns:x}"', st.st_mtime)
+
+
+def not_modified(request_headers, etag: str, mtime: float) -> bool:
+	"""Evaluate ``If-None-Match`` / ``If-Modified-Since`` against a resource's validators."""
+	inm = request_headers.get("if-none-match")
+	if inm is not None:
+		return etag in [tag.strip() for tag in inm.split(",")] or inm.strip() == "*"
+	ims = request_headers.get("if-modified-since")
+	if ims:
+		try:
+			return int(mtime) <= int(parsedate_to_datetime(ims).timestamp())
+		except (TypeError, ValueError):
+			return False
+	return False
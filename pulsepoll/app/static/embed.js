@@ -0,0 +1,59 @@
+// Live results for the embed page (/e/{code}); its CSP only allows scripts from 'self'.
+(() => {
+	const state = JSON.parse(document.getElementById('results-data').textContent);
+	const code = document.body.dataset.poll;
+
+	function renderResults(data) {
+		const total = data.total || 0;
+		const container = document.getElementById('results');
+		container.innerHTML = '';
+		for (const opt of data.options) {
+			const percent = total > 0 ? Math.round((opt.count / total) * 100) : 0;
+			const row = document.createElement('div');
+			row.innerHTML = `
+				<div class="text-sm font-medium mb-1">${opt.text} - ${opt.count} (${percent}%)</div>
+				<div class="w-full bg-gray-200 rounded h-2">
+					<div class="bg-indigo-600 h-2 rounded" style="width: ${percent}%;"></div>
+				</div>
+			`;
+			container.appendChild(row);
+		}
+	}
+	// the server rendered this tally; live updates and fallback polling continue from its version
+	let live = Object.assign({ type: 'snapshot', seq: state.results.version }, state.results);
+	let resultsEtag = state.etag;
+	async function fetchResultsOnce() {
+		const res = await fetch(`/p/${code}/results`, { headers: { 'If-None-Match': resultsEtag } });
+		if (res.status === 200) {
+			const data = await res.json();
+			resultsEtag = res.headers.get('ETag') || resultsEtag;
+			live = Object.assign({ type: 'snapshot', seq: data.version }, data);
+			renderResults(live);
+		}
+	}
+	function applyLive(msg) {
+		if (msg.type === 'snapshot') {
+			live = msg;
+		} else if (msg.type === 'delta' && live && msg.prev === live.seq) {
+			const byId = new Map(live.options.map((o) => [o.id, o]));
+			for (const [id, count] of msg.changes) { const opt = byId.get(id); if (opt) opt.count = count; }
+			live.total = msg.total;
+			live.seq = msg.seq;
+		} else { return; }
+		renderResults(live);
+	}
+	function listenEvents() {
+		if (!!window.EventSource) {
+			const es = new EventSource(`/p/${code}/events?since=` + live.seq);
+			es.onmessage = (e) => { try { applyLive(JSON.parse(e.data)); } catch {} };
+			es.onerror = () => { if (es.readyState === EventSource.CLOSED) { setInterval(fetchResultsOnce, 2000); } };
+		} else { setInterval(fetchResultsOnce, 2000); }
+	}
+	if (!!window.WebSocket) {
+		const ws = new WebSocket((location.protocol === 'https:' ? 'wss://' : 'ws://') + location.host + `/ws/p/${code}?since=` + live.seq);
+		let opened = false;
+		ws.onopen = () => { opened = true; };
+		ws.onmessage = (e) => { try { applyLive(JSON.parse(e.data)); } catch {} };
+		ws.onclose = () => { if (!opened) { listenEvents(); } else { setInterval(fetchResultsOnce, 2000); } };
+	} else { listenEvents(); }
+})();
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from fastapi.templating import Jinja2Templates
+
+
+class RequestTiming:
+	"""Where one request's time went; filled in by engine events and template rendering."""
+
+	__slots__ = ("started", "queries", "db_seconds", "renders", "render_seconds")
+
+	def __init__(self) -> None:
+		self.started = time.perf_counter()
+		self.queries = 0
+		self.db_seconds = 0.0
+		self.renders = 0
+		self.render_seconds = 0.0
+
+	def elapsed(self) -> float:
+		return time.perf_counter() - self.started
+
+	def header(self, total: float) -> str:
+		"""``Server-Timing`` value with db, render and total (``app``) durations in ms."""
+		return (
+			f'db;dur={self.db_seconds * 1000:.1f};desc="{self.queries} queries", '
+			f"render;dur={self.render_seconds * 1000:.1f}, "
+			f"app;dur={total * 1000:.1f}"
+		)
+
+
+# set per request by ServerTimingMiddleware; threadpool calls inherit it with the rest of the context
+current: ContextVar[Optional[RequestTiming]] = ContextVar("request_timing", default=None)
+
+
+def record_query(seconds: float) -> None:
+	timing = current.get()
+	if timing is not None:
+		timing.queries += 1
+		timing.db_seconds += seconds
+
+
+class TimedTemplates(Jinja2Templates):
+	"""``Jinja2Templates`` that adds rendering time to the current request's timing."""
+
+	def TemplateResponse(self, *args: Any, **kwargs: Any):
+		timing = current.get()
+		if timing is None:
+			return super().TemplateResponse(*args, **kwargs)
+		started = time.perf_counter()
+		try:
+			return super().TemplateResponse(*args, **kwargs)
+		finally:
+			timing.renders += 1
+			timing.render_seconds += time.perf_counter() - started
+
+	def render(self, name: str, context: Dict[str, Any]) -> str:
+		"""Render ``name`` to a string, timed like ``TemplateResponse``."""
+		timing = current.get()
+		started = time.perf_counter()
+		try:
+			return self.get_template(name).render(context)
+		finally:
+			if timing is not None:
+				timing.renders += 1
+				timing.render_seconds += time.perf_counter() - started
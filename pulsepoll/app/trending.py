@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import datetime as dt
+import math
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+
+class TrendingIndex:
+	"""Incrementally maintained trending ranking of polls.
+
+	Every vote lands in a per-poll ring of ``bucket_seconds`` buckets covering
+	``window_seconds`` and adds to an exponentially decayed score. Scores are
+	stored relative to a fixed landmark time (a vote at time t weighs
+	``2 ** ((t - landmark) / half_life)``), so scores of polls that receive no
+	votes never need updating and their relative order stays correct as time
+	passes. The best ``capacity`` polls are kept in a sorted list, making
+	``top(k)`` O(k).
+	"""
+
+	def __init__(
+		self,
+		window_seconds: int = 24 * 60 * 60,
+		bucket_seconds: int = 60,
+		half_life_seconds: float = 60 * 60,
+		capacity: int = 100,
+	) -> None:
+		self.window_seconds = window_seconds
+		self.bucket_seconds = bucket_seconds
+		self.half_life = half_life_seconds
+		self.capacity = capacity
+		self._landmark = time.time()
+		# rebase (and prune idle polls) about once per window, well before 2**exponent overflows
+		self._max_exponent = min(512.0, max(1.0, window_seconds / half_life_seconds))
+		self._scores: Dict[int, float] = {}
+		self._buckets: Dict[int, Deque[List[int]]] = {}
+		self._top: List[int] = []
+		self._lock = threading.Lock()
+
+	def __len__(self) -> int:
+		return len(self._scores)
+
+	def record(self, poll_id: int, at: Optional[float] = None, weight: int = 1) -> None:
+		now = time.time() if at is None else at
+		bucket = int(now // self.bucket_seconds)
+		with self._lock:
+			ring = self._buckets.get(poll_id)
+			if ring is None:
+				ring = deque()
+				self._buckets[poll_id] = ring
+			if not ring or ring[-1][0] < bucket:
+				ring.append([bucket, weight])
+			else:
+				# late timestamps (e.g. clock skew) are folded into the newest bucket
+				ring[-1][1] += weight
+			self._trim(ring, ring[-1][0])
+			exponent = (now - self._landmark) / self.half_life
+			if exponent > self._max_exponent:
+				self._rebase(now)
+				exponent = 0.0
+			self._scores[poll_id] = self._scores.get(poll_id, 0.0) + weight * math.pow(2.0, exponent)
+			self._promote(poll_id)
+
+	def top(self, k: int) -> List[Tuple[int, float]]:
+		"""Return up to ``k`` ``(poll_id, score)`` pairs, best first, scores decayed to now."""
+		scale = math.pow(2.0, -(time.time() - self._landmark) / self.half_life)
+		with self._lock:
+			return [(poll_id, self._scores[poll_id] * scale) for poll_id in self._top[:k]]
+
+	def window_count(self, poll_id: int, now: Optional[float] = None) -> int:
+		"""Votes recorded for ``poll_id`` within the window."""
+		current = int((time.time() if now is None else now) // self.bucket_seconds)
+		oldest = current - self.window_seconds // self.bucket_seconds
+		with self._lock:
+			ring = self._buckets.get(poll_id)
+			return sum(count for bucket, count in ring if bucket > oldest) if ring else 0
+
+	def warm(self, rows: Iterable[Tuple[int, dt.datetime]]) -> int:
+		"""Replay ``(poll_id, created_at)`` rows (naive UTC, oldest first) from storage. Returns rows replayed."""
+		replayed = 0
+		for poll_id, created_at in rows:
+			self.record(poll_id, at=created_at.replace(tzinfo=dt.timezone.utc).timestamp())
+			replayed += 1
+		return replayed
+
+	def _trim(self, ring: Deque[List[int]], bucket: int) -> None:
+		oldest = bucket - self.window_seconds // self.bucket_seconds
+		while ring and ring[0][0] <= oldest:
+			ring.popleft()
+
+	def _promote(self, poll_id: int) -> None:
+		top = self._top
+		scores = self._scores
+		if poll_id in top:
+			i = top.index(poll_id)
+		elif len(top) < self.capacity:
+			top.append(poll_id)
+			i = len(top) - 1
+		elif scores[poll_id] > scores[top[-1]]:
+			top[-1] = poll_id
+			i = len(top) - 1
+		else:
+			return
+		# scores only grow, so the poll can only move towards the front
+		while i > 0 and scores[top[i - 1]] < scores[poll_id]:
+			top[i] = top[i - 1]
+			i -= 1
+		top[i] = poll_id
+
+	def _rebase(self, now: float) -> None:
+		"""Move the landmark to ``now`` and forget polls with no votes left in the window."""
+		factor = math.pow(2.0, -(now - self._landmark) / self.half_life)
+		self._landmark = now
+		bucket = int(now // self.bucket_seconds)
+		for poll_id in list(self._scores):
+			ring = self._buckets.get(poll_id)
+			if ring is not None:
+				self._trim(ring, bucket)
+			if not ring:
+				self._scores.pop(poll_id, None)
+				self._buckets.pop(poll_id, None)
+			else:
+				self._scores[poll_id] *= factor
+		self._top = sorted(self._scores, key=self._scores.__getitem__, reverse=True)[: self.capacity]
@@ -1,21 +1,16 @@
 from __future__ import annotations
 
-import random
-import string
+import sys
+import threading
 import time
 import uuid
 import hashlib
-import json
-from typing import Dict, Optional, Tuple
+import hmac
+from collections import OrderedDict
+from typing import Dict
 
 from fastapi import Request, Response
-
-
-_BASE62_ALPHABET = string.digits + string.ascii_lowercase + string.ascii_uppercase
-
-
-def generate_short_code(length: int = 7) -> str:
-	return "".join(random.choice(_BASE62_ALPHABET) for _ in range(length))
+from starlette.requests import HTTPConnection
 
 
 def get_or_set_voter_id(request: Request, response: Response) -> str:
@@ -27,7 +22,22 @@ def get_or_set_voter_id(request: Request, response: Response) -> str:
 	return voter_id
 
 
-def detect_language(request: Request) -> str:
+RECENT_WRITE_COOKIE = "recent_write"
+
+
+def mark_recent_write(response: Response, seconds: int) -> None:
+	"""Flag the client as having just written so its reads go to the primary for ``seconds``."""
+	response.set_cookie(RECENT_WRITE_COOKIE, str(int(time.time()) + seconds), max_age=seconds, httponly=True, samesite="lax")
+
+
+def has_recent_write(request: Request) -> bool:
+	try:
+		return int(request.cookies.get(RECENT_WRITE_COOKIE, "0")) > time.time()
+	except ValueError:
+		return False
+
+
+def detect_language(request: HTTPConnection) -> str:
 	cookie_lang = request.cookies.get("lang")
 	if cookie_lang:
 		return cookie_lang
@@ -41,21 +51,110 @@ def detect_language(request: Request) -> str:
 	return "en"
 
 
-class SimpleRateLimiter:
-	"""Very basic in-memory rate limiter keyed by (key, window_seconds)."""
-
-	def __init__(self) -> None:
-		self._store: Dict[Tuple[str, int], Tuple[int, float]] = {}
-
-	def allow(self, key: str, limit: int, window_seconds: int) -> bool:
+class _Window:
+	__slots__ = ("window", "bucket", "previous", "current", "touched")
+
+	def __init__(self, window: int, bucket: int, now: float) -> None:
+		self.window = window
+		self.bucket = bucket
+		self.previous = 0
+		self.current = 0
+		self.touched = now
+
+
+class SlidingWindowRateLimiter:
+	"""In-memory sliding-window rate limiter with bounded memory.
+
+	Each key keeps the counts of the current and previous fixed windows and
+	weights the previous one by how much of it still overlaps the sliding
+	window, which removes the 2x burst allowed at fixed-window boundaries.
+	Keys live in one least-recently-used store per window length, so each
+	store's cold end is also its next key to expire: every check evicts a few
+	expired keys from each, and ``max_keys`` caps the total by dropping the
+	key closest to expiry.
+	"""
+
+	def __init__(self, max_keys: int = 100_000, sweep: int = 4) -> None:
+		self.max_keys = max_keys
+		self.sweep = sweep
+		self._stores: Dict[int, "OrderedDict[str, _Window]"] = {}
+		self._size = 0
+		self._lock = threading.Lock()
+		self.rejected = 0
+		self.evicted_expired = 0
+		self.evicted_capacity = 0
+
+	def allow(self, key: str, limit: int, window_seconds: int, cost: int = 1) -> bool:
+		"""Count ``cost`` requests against ``key``; False (and nothing counted) if that would exceed ``limit``."""
 		now = time.time()
 		bucket = int(now // window_seconds)
-		k = (key, bucket)
-		count, _ = self._store.get(k, (0, now))
-		if count >= limit:
-			return False
-		self._store[k] = (count + 1, now)
-		return True
+		with self._lock:
+			self._evict(now)
+			store = self._stores.get(window_seconds)
+			if store is None:
+				store = self._stores[window_seconds] = OrderedDict()
+			entry = store.get(key)
+			if entry is None:
+				while self._size >= self.max_keys:
+					self._evict_coldest()
+				entry = _Window(window_seconds, bucket, now)
+				store[key] = entry
+				self._size += 1
+			else:
+				store.move_to_end(key)
+				entry.touched = now
+				if entry.bucket != bucket:
+					entry.previous = entry.current if bucket - entry.bucket == 1 else 0
+					entry.current = 0
+					entry.bucket = bucket
+			overlap = 1.0 - (now % window_seconds) / window_seconds
+			# room for ``cost`` more means the last of them still sees fewer than ``limit``
+			if entry.previous * overlap + entry.current + (cost - 1) >= limit:
+				self.rejected += 1
+				return False
+			entry.current += cost
+			return True
+
+	def _evict(self, now: float) -> None:
+		for window, store in self._stores.items():
+			for _ in range(self.sweep):
+				if not store:
+					break
+				key, entry = next(iter(store.items()))
+				if now - entry.touched < 2 * window:
+					break
+				del store[key]
+				self._size -= 1
+				self.evicted_expired += 1
+
+	def _evict_coldest(self) -> None:
+		# the key whose counts stop mattering soonest, so long windows still counting are kept
+		store = min((store for store in self._stores.values() if store), key=self._first_expiry)
+		store.popitem(last=False)
+		self._size -= 1
+		self.evicted_capacity += 1
+
+	@staticmethod
+	def _first_expiry(store: "OrderedDict[str, _Window]") -> float:
+		entry = next(iter(store.values()))
+		return entry.touched + 2 * entry.window
+
+	def __len__(self) -> int:
+		return self._size
+
+	def stats(self) -> Dict[str, int]:
+		with self._lock:
+			keys = self._size
+			sample = next((next(iter(store.items())) for store in self._stores.values() if store), None)
+		per_key = sys.getsizeof(sample[0]) + sys.getsizeof(sample[1]) if sample else 0
+		return {
+			"keys": keys,
+			"max_keys": self.max_keys,
+			"approx_bytes": sum(sys.getsizeof(store) for store in self._stores.values()) + keys * per_key,
+			"rejected": self.rejected,
+			"evicted_expired": self.evicted_expired,
+			"evicted_capacity": self.evicted_capacity,
+		}
 
 
 def get_client_ip(request: Request) -> str:
@@ -66,6 +165,17 @@ def get_client_ip(request: Request) -> str:
 	return request.client.host if request.client else "anon"
 
 
-def compute_etag(obj: object) -> str:
-	payload = json.dumps(obj, sort_keys=True, separators=(",", ":")).encode("utf-8")
-	return 'W/"' + hashlib.sha1(payload).hexdigest() + '"'
\ No newline at end of file
+def results_etag(poll_id: int, version: int) -> str:
+	"""Strong ETag for a poll's results at a given results version."""
+	return f'"r{poll_id}.{version}"'
+
+
+def hash_voter_id(voter_id: str, poll_id: int, secret: str) -> str:
+	"""Per-poll pseudonym for a voter cookie, for exports that must not leak the raw id.
+
+	Keyed with a server secret and the poll id, so the same browser cannot be
+	linked across polls' exports.
+	"""
+	if not secret:
+		raise ValueError("a voter hash secret is required")
+	return hmac.new(secret.encode("utf-8"), f"{poll_id}:{voter_id}".encode("utf-8"), hashlib.sha256).hexdigest()[:32]
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import datetime as dt
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, func, inspect, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from . import counters
+from .models import Option, Poll, Vote
+
+
+UNIQUE_INDEX_NAME = "uq_vote_poll_voter"
+
+
+@dataclass(frozen=True)
+class VoteOutcome:
+	poll_id: int
+	option_id: int
+	previous_option_id: Optional[int]
+	created: bool
+	changed: bool
+
+
+def _insert_first(session: Session, poll_id: int, option_id: int, voter_id: str, created_at: dt.datetime) -> bool:
+	"""Insert a voter's first vote; False if the voter already has a row."""
+	insert = counters.dialect_insert(session)
+	if insert is not None:
+		stmt = (
+			insert(Vote)
+			.values(poll_id=poll_id, option_id=option_id, voter_id=voter_id, created_at=created_at)
+			.on_conflict_do_nothing(index_elements=[Vote.poll_id, Vote.voter_id])
+			.returning(Vote.id)
+		)
+		return session.exec(stmt).first() is not None
+	try:
+		with session.begin_nested():
+			session.add(Vote(poll_id=poll_id, option_id=option_id, voter_id=voter_id, created_at=created_at))
+	except IntegrityError:
+		return False
+	return True
+
+
+def _move_vote(session: Session, poll_id: int, voter_id: str, previous_option_id: int, option_id: int, created_at: dt.datetime) -> bool:
+	"""Compare-and-swap a voter's option; False if it is no longer ``previous_option_id``."""
+	result = session.exec(
+		update(Vote)
+		.where(Vote.poll_id == poll_id, Vote.voter_id == voter_id, Vote.option_id == previous_option_id)
+		.values(option_id=option_id, created_at=created_at)
+	)
+	return result.rowcount == 1
+
+
+def cast_vote(
+	session: Session, poll_id: int, option_id: int, voter_id: str, created_at: Optional[dt.datetime] = None, attempts: int = 5
+) -> VoteOutcome:
+	"""Insert or move a voter's vote and update the counters, without committing.
+
+	A first vote is an ``INSERT ... ON CONFLICT DO NOTHING`` and a change is an
+	``UPDATE ... WHERE option_id = <the option read>``, so a write only lands
+	if the row still holds what the counters are adjusted from. When a
+	concurrent request for the same voter wins, the row is read again and the
+	step retried. ``created_at`` records when the current choice was made.
+	"""
+	created_at = created_at or dt.datetime.utcnow()
+	for _ in range(attempts):
+		previous_option_id = session.exec(
+			select(Vote.option_id).where(Vote.poll_id == poll_id, Vote.voter_id == voter_id)
+		).first()
+		if previous_option_id == option_id:
+			return VoteOutcome(poll_id, option_id, previous_option_id, created=False, changed=False)
+		if previous_option_id is None:
+			written = _insert_first(session, poll_id, option_id, voter_id, created_at)
+		else:
+			written = _move_vote(session, poll_id, voter_id, previous_option_id, option_id, created_at)
+		if written:
+			counters.record_vote(session, poll_id, option_id, previous_option_id)
+			return VoteOutcome(poll_id, option_id, previous_option_id, created=previous_option_id is None, changed=True)
+	# still losing to the same voter after several rounds: write unconditionally and recount the poll
+	moved = session.exec(
+		update(Vote).where(Vote.poll_id == poll_id, Vote.voter_id == voter_id).values(option_id=option_id, created_at=created_at)
+	).rowcount
+	if not moved:
+		_insert_first(session, poll_id, option_id, voter_id, created_at)
+	counters.rebuild(session, poll_id)
+	return VoteOutcome(poll_id, option_id, None, created=False, changed=True)
+
+
+@dataclass(frozen=True)
+class BatchVote:
+	code: str
+	option_id: int
+	voter_id: str
+	client_ts: Optional[dt.datetime] = None
+	idempotency_key: Optional[str] = None
+
+
+def cast_votes_batch(session: Session, records: Sequence[BatchVote]) -> Tuple[List[str], List[VoteOutcome]]:
+	"""Validate and write many votes with set-based queries, without committing.
+
+	Returns one status per record (``created``, ``updated``, ``unchanged``,
+	``duplicate``, ``superseded``, ``not_found`` or ``invalid_option``) plus the
+	outcomes of the votes that were written. Records sharing an idempotency key
+	within the batch are written once; when one voter has several records for a
+	poll, the one with the latest ``client_ts`` wins. A record whose
+	``client_ts`` is older than the voter's stored vote is ``superseded``, so
+	replaying an old offline batch cannot revert a newer choice. New votes go out in one
+	``INSERT ... ON CONFLICT DO NOTHING`` and changes use the same
+	compare-and-swap as ``cast_vote``; rows another request wrote in the
+	meantime fall back to ``cast_vote``. Counters are adjusted once per
+	touched option.
+	"""
+	statuses: List[str] = [""] * len(records)
+	codes = {r.code for r in records}
+	poll_ids = dict(session.exec(select(Poll.code, Poll.id).where(Poll.code.in_(codes))).all()) if codes else {}
+	valid_options = set()
+	if poll_ids:
+		valid_options = set(session.exec(select(Option.poll_id, Option.id).where(Option.poll_id.in_(poll_ids.values()))).all())
+
+	seen_keys = set()
+	winners: Dict[Tuple[int, str], int] = {}
+	for i, record in enumerate(records):
+		if record.idempotency_key is not None:
+			if record.idempotency_key in seen_keys:
+				statuses[i] = "duplicate"
+				continue
+			seen_keys.add(record.idempotency_key)
+		poll_id = poll_ids.get(record.code)
+		if poll_id is None:
+			statuses[i] = "not_found"
+			continue
+		if (poll_id, record.option_id) not in valid_options:
+			statuses[i] = "invalid_option"
+			continue
+		key = (poll_id, record.voter_id)
+		current = winners.get(key)
+		if current is not None and _sort_ts(records[current]) > _sort_ts(record):
+			statuses[i] = "superseded"
+			continue
+		if current is not None:
+			statuses[current] = "superseded"
+		winners[key] = i
+	if not winners:
+		return statuses, []
+
+	voter_ids = {voter_id for _, voter_id in winners}
+	existing = {
+		(poll_id, voter_id): (option_id, created_at)
+		for poll_id, voter_id, option_id, created_at in session.exec(
+			select(Vote.poll_id, Vote.voter_id, Vote.option_id, Vote.created_at).where(
+				Vote.poll_id.in_({poll_id for poll_id, _ in winners}), Vote.voter_id.in_(voter_ids)
+			)
+		).all()
+	}
+
+	now = dt.datetime.utcnow()
+	outcomes: List[VoteOutcome] = []
+	deltas: Dict[Tuple[int, int], int] = defaultdict(int)
+	new_rows = []
+	retry: List[int] = []
+	for (poll_id, voter_id), i in winners.items():
+		record = records[i]
+		previous, stored_at = existing.get((poll_id, voter_id), (None, None))
+		if previous == record.option_id:
+			statuses[i] = "unchanged"
+			continue
+		if previous is not None and record.client_ts is not None and record.client_ts < stored_at:
+			statuses[i] = "superseded"
+			continue
+		created_at = min(record.client_ts, now) if record.client_ts else now
+		if previous is None:
+			new_rows.append((i, {"poll_id": poll_id, "option_id": record.option_id, "voter_id": voter_id, "created_at": created_at}))
+		elif _move_vote(session, poll_id, voter_id, previous, record.option_id, created_at):
+			statuses[i] = "updated"
+			outcomes.append(VoteOutcome(poll_id, record.option_id, previous, created=False, changed=True))
+			deltas[(poll_id, record.option_id)] += 1
+			deltas[(poll_id, previous)] -= 1
+		else:
+			retry.append(i)
+
+	insert = counters.dialect_insert(session)
+	if new_rows and insert is not None:
+		stmt = insert(Vote).on_conflict_do_nothing(index_elements=[Vote.poll_id, Vote.voter_id]).returning(Vote.poll_id, Vote.voter_id)
+		inserted = set(session.execute(stmt, [row for _, row in new_rows]).all())
+		for i, row in new_rows:
+			if (row["poll_id"], row["voter_id"]) not in inserted:
+				retry.append(i)
+				continue
+			statuses[i] = "created"
+			outcomes.append(VoteOutcome(row["poll_id"], row["option_id"], None, created=True, changed=True))
+			deltas[(row["poll_id"], row["option_id"])] += 1
+	else:
+		retry.extend(i for i, _ in new_rows)
+	counters.apply_deltas(session, deltas)
+
+	# rows another request wrote since they were read go through the one-at-a-time path
+	for i in retry:
+		record = records[i]
+		created_at = min(record.client_ts, now) if record.client_ts else now
+		outcome = cast_vote(session, poll_ids[record.code], record.option_id, record.voter_id, created_at)
+		statuses[i] = "created" if outcome.created else "updated" if outcome.changed else "unchanged"
+		if outcome.changed:
+			outcomes.append(outcome)
+	return statuses, outcomes
+
+
+def _sort_ts(record: BatchVote) -> dt.datetime:
+	return record.client_ts or dt.datetime.min
+
+
+def ensure_unique_index(engine: Engine) -> int:
+	"""Add the ``(poll_id, voter_id)`` unique index to databases created before it existed.
+
+	Duplicate votes left over from the old read-modify-write path are removed first,
+	keeping each voter's latest row. Returns the number of rows deleted.
+	"""
+	if any(ix["name"] == UNIQUE_INDEX_NAME for ix in inspect(engine).get_indexes(Vote.__tablename__)):
+		return 0
+	with Session(engine) as session:
+		keep = select(func.max(Vote.id)).group_by(Vote.poll_id, Vote.voter_id)
+		removed = session.exec(delete(Vote).where(Vote.id.not_in(keep))).rowcount or 0
+		if removed:
+			counters.rebuild(session)
+		session.commit()
+	index = next(ix for ix in Vote.__table__.indexes if ix.name == UNIQUE_INDEX_NAME)
+	index.create(engine, checkfirst=True)
+	return removed
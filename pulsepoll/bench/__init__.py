@@ -0,0 +1 @@
+"""Load scenarios for PulsePoll's hot endpoints; run with ``python -m bench``."""
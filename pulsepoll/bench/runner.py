@@ -0,0 +1,418 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+
+@dataclass
+class BenchOptions:
+	polls: int = 200
+	votes: int = 20_000
+	requests: int = 2000
+	concurrency: int = 32
+	subscribers: int = 200
+	rounds: int = 20
+
+
+@dataclass
+class ScenarioResult:
+	name: str
+	latencies: List[float]
+	elapsed: float
+	errors: int = 0
+	queries: Optional[int] = None
+	extra: Dict[str, float] = field(default_factory=dict)
+
+	def summary(self) -> Dict[str, float]:
+		count = len(self.latencies)
+		summary = {
+			"requests": count,
+			"errors": self.errors,
+			"throughput_rps": round(count / self.elapsed, 1) if self.elapsed else 0.0,
+			"p50_ms": round(percentile(self.latencies, 50) * 1000, 2),
+			"p95_ms": round(percentile(self.latencies, 95) * 1000, 2),
+			"p99_ms": round(percentile(self.latencies, 99) * 1000, 2),
+		}
+		if self.queries is not None:
+			summary["queries"] = self.queries
+			summary["queries_per_request"] = round(self.queries / count, 3) if count else 0.0
+		summary.update(self.extra)
+		return summary
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+	"""Nearest-rank percentile; 0.0 for an empty sample."""
+	if not values:
+		return 0.0
+	ordered = sorted(values)
+	rank = max(1, -(-len(ordered) * pct // 100))
+	return ordered[int(rank) - 1]
+
+
+class QueryCounter:
+	"""Counts SQL statements sent through the app's engines (in-process runs only)."""
+
+	def __init__(self, engines) -> None:
+		from sqlalchemy import event
+
+		self.count = 0
+		self._engines = list({id(e): e for e in engines}.values())
+		self._event = event
+		for engine in self._engines:
+			event.listen(engine, "before_cursor_execute", self._record)
+
+	def _record(self, *args) -> None:
+		self.count += 1
+
+	def close(self) -> None:
+		for engine in self._engines:
+			self._event.remove(engine, "before_cursor_execute", self._record)
+
+
+@dataclass
+class BenchContext:
+	client: httpx.AsyncClient
+	app: Optional[object]
+	options: BenchOptions
+	codes: List[str]
+	option_ids: Dict[str, List[int]]
+	queries: Optional[QueryCounter] = None
+	run_id: str = field(default_factory=lambda: f"{int(time.time())}")
+
+	@property
+	def hot(self) -> str:
+		return self.codes[0]
+
+
+def _ip(i: int) -> str:
+	# spread synthetic clients over many addresses so per-IP rate limits do not skew the numbers
+	return f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}"
+
+
+async def _drive(total: int, concurrency: int, request: Callable[[int], Awaitable[bool]]) -> Tuple[List[float], int, float]:
+	latencies: List[float] = []
+	errors = 0
+	indices = iter(range(total))
+
+	async def worker() -> None:
+		nonlocal errors
+		for i in indices:
+			start = time.perf_counter()
+			try:
+				ok = await request(i)
+			except Exception:
+				ok = False
+			latencies.append(time.perf_counter() - start)
+			if not ok:
+				errors += 1
+
+	started = time.perf_counter()
+	await asyncio.gather(*(worker() for _ in range(concurrency)))
+	return latencies, errors, time.perf_counter() - started
+
+
+async def seed(client: httpx.AsyncClient, options: BenchOptions) -> Tuple[List[str], Dict[str, List[int]]]:
+	"""Create ``options.polls`` polls and ``options.votes`` votes through the batch APIs."""
+	codes: List[str] = []
+	for start in range(0, options.polls, 500):
+		batch = [
+			{"question": f"Bench poll {n}?", "options": [f"Option {k}" for k in range(4)]}
+			for n in range(start, min(start + 500, options.polls))
+		]
+		resp = await client.post("/api/polls:batch", json={"polls": batch}, headers={"x-forwarded-for": _ip(start // 500)})
+		resp.raise_for_status()
+		codes.extend(r["code"] for r in resp.json()["results"])
+	option_ids: Dict[str, List[int]] = {}
+	for code in codes:
+		resp = await client.get(f"/api/polls/{code}")
+		resp.raise_for_status()
+		option_ids[code] = [o["id"] for o in resp.json()["options"]]
+	rng = random.Random(42)
+	# half of the votes go to the first poll so it behaves like a hot poll
+	for start in range(0, options.votes, 1000):
+		batch = []
+		for n in range(start, min(start + 1000, options.votes)):
+			code = codes[0] if n % 2 == 0 else rng.choice(codes)
+			batch.append({"code": code, "option_id": rng.choice(option_ids[code]), "voter_id": f"seed-{n}"})
+		resp = await client.post("/api/votes:batch", json={"votes": batch}, headers={"x-forwarded-for": _ip(start // 1000)})
+		resp.raise_for_status()
+	return codes, option_ids
+
+
+async def vote_storm(ctx: BenchContext) -> ScenarioResult:
+	"""Many distinct voters voting on one hot poll at once."""
+	choices = ctx.option_ids[ctx.hot]
+
+	async def request(i: int) -> bool:
+		resp = await ctx.client.post(
+			f"/api/polls/{ctx.hot}/vote",
+			json={"option_id": choices[i % len(choices)]},
+			headers={"x-forwarded-for": _ip(i), "cookie": f"voter_id=storm-{ctx.run_id}-{i}"},
+		)
+		return resp.status_code in (200, 202)
+
+	latencies, errors, elapsed = await _drive(ctx.options.requests, ctx.options.concurrency, request)
+	return ScenarioResult("vote_storm", latencies, elapsed, errors)
+
+
+async def results_polling(ctx: BenchContext) -> ScenarioResult:
+	"""Viewers revalidating results with their last ETag; 80% of them watch the hot poll."""
+	etags: Dict[int, str] = {}
+	not_modified = 0
+
+	async def request(i: int) -> bool:
+		nonlocal not_modified
+		viewer = i % 500
+		code = ctx.hot if viewer % 5 else ctx.codes[viewer % len(ctx.codes)]
+		headers = {"if-none-match": etags[viewer]} if viewer in etags else {}
+		resp = await ctx.client.get(f"/p/{code}/results", headers=headers)
+		if resp.status_code == 304:
+			not_modified += 1
+		elif resp.status_code == 200:
+			etags[viewer] = resp.headers.get("etag", "")
+		else:
+			return False
+		return True
+
+	latencies, errors, elapsed = await _drive(ctx.options.requests, ctx.options.concurrency, request)
+	result = ScenarioResult("results_polling", latencies, elapsed, errors)
+	result.extra["not_modified_ratio"] = round(not_modified / len(latencies), 3) if latencies else 0.0
+	return result
+
+
+async def trending_page(ctx: BenchContext) -> ScenarioResult:
+	"""Server-rendered home and trending pages."""
+
+	async def request(i: int) -> bool:
+		resp = await ctx.client.get("/trending" if i % 2 else "/")
+		return resp.status_code == 200
+
+	requests = max(1, ctx.options.requests // 4)
+	latencies, errors, elapsed = await _drive(requests, ctx.options.concurrency, request)
+	return ScenarioResult("trending_page", latencies, elapsed, errors)
+
+
+async def middleware_overhead(ctx: BenchContext) -> ScenarioResult:
+	"""Health check and a static file: almost no handler work, so latency is mostly the middleware stack."""
+
+	async def request(i: int) -> bool:
+		resp = await ctx.client.get("/static/logo.svg" if i % 2 else "/health")
+		return resp.status_code == 200
+
+	latencies, errors, elapsed = await _drive(ctx.options.requests, ctx.options.concurrency, request)
+	return ScenarioResult("middleware_overhead", latencies, elapsed, errors)
+
+
+async def _asgi_sse(app, path: str) -> AsyncIterator[str]:
+	"""Yield SSE ``data:`` payloads straight from the ASGI app (httpx's ASGI transport buffers bodies)."""
+	chunks: asyncio.Queue = asyncio.Queue()
+	disconnected = asyncio.Event()
+	scope = {
+		"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+		"path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+		"headers": [(b"host", b"bench"), (b"accept", b"text/event-stream")], "client": ("127.0.0.1", 0), "server": ("bench", 80),
+	}
+
+	async def receive():
+		await disconnected.wait()
+		return {"type": "http.disconnect"}
+
+	async def send(message):
+		if message["type"] == "http.response.body":
+			await chunks.put(message.get("body", b""))
+
+	task = asyncio.create_task(app(scope, receive, send))
+	buffer = ""
+	try:
+		while True:
+			chunk = await chunks.get()
+			buffer += chunk.decode("utf-8")
+			while "\n\n" in buffer:
+				event, buffer = buffer.split("\n\n", 1)
+				for line in event.splitlines():
+					if line.startswith("data:"):
+						yield line[5:].strip()
+	finally:
+		disconnected.set()
+		task.cancel()
+		await asyncio.gather(task, return_exceptions=True)
+
+
+async def _http_sse(client: httpx.AsyncClient, path: str) -> AsyncIterator[str]:
+	async with client.stream("GET", path, timeout=None) as resp:
+		async for line in resp.aiter_lines():
+			if line.startswith("data:"):
+				yield line[5:].strip()
+
+
+async def sse_fanout(ctx: BenchContext) -> ScenarioResult:
+	"""Open many SSE subscribers on the hot poll, then time how long each vote takes to reach all of them."""
+	path = f"/p/{ctx.hot}/events"
+	subscribers = ctx.options.subscribers
+	round_started = 0.0
+	delivered: List[float] = []
+	connected = 0
+	received = 0
+	progress = asyncio.Condition()
+
+	async def subscriber() -> None:
+		nonlocal connected, received
+		stream = _asgi_sse(ctx.app, path) if ctx.app is not None else _http_sse(ctx.client, path)
+		first = True
+		async for _ in stream:
+			async with progress:
+				if first:
+					connected += 1
+					first = False
+				else:
+					delivered.append(time.perf_counter() - round_started)
+					received += 1
+				progress.notify_all()
+
+	tasks = [asyncio.create_task(subscriber()) for _ in range(subscribers)]
+	timeouts = 0
+	started = time.perf_counter()
+	try:
+		async with progress:
+			await asyncio.wait_for(progress.wait_for(lambda: connected >= subscribers), 30)
+		choices = ctx.option_ids[ctx.hot]
+		for n in range(ctx.options.rounds):
+			target = received + subscribers
+			round_started = time.perf_counter()
+			await ctx.client.post(
+				f"/api/polls/{ctx.hot}/vote",
+				json={"option_id": choices[n % len(choices)]},
+				headers={"x-forwarded-for": _ip(n), "cookie": f"voter_id=sse-{ctx.run_id}-{n}"},
+			)
+			try:
+				async with progress:
+					await asyncio.wait_for(progress.wait_for(lambda: received >= target), 10)
+			except asyncio.TimeoutError:
+				timeouts += 1
+				received = target
+	finally:
+		for task in tasks:
+			task.cancel()
+		await asyncio.gather(*tasks, return_exceptions=True)
+	return ScenarioResult("sse_fanout", delivered, time.perf_counter() - started, timeouts)
+
+
+SCENARIOS: Dict[str, Callable[[BenchContext], Awaitable[ScenarioResult]]] = {
+	"vote_storm": vote_storm,
+	"results_polling": results_polling,
+	"sse_fanout": sse_fanout,
+	"trending_page": trending_page,
+	"middleware_overhead": middleware_overhead,
+}
+
+
+async def run_scenarios(names: Sequence[str], options: BenchOptions, url: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+	"""Seed a database and run the named scenarios; returns one summary per scenario."""
+	app = None
+	counter: Optional[QueryCounter] = None
+	if url is None:
+		from app import db
+		from app.main import create_app
+
+		db.init_db()
+		app = create_app()
+		transport = httpx.ASGITransport(app=app)
+		client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60)
+	else:
+		client = httpx.AsyncClient(base_url=url, timeout=60)
+	summaries: Dict[str, Dict[str, float]] = {}
+	async with client:
+		codes, option_ids = await seed(client, options)
+		if app is not None:
+			from app import db
+
+			counter = QueryCounter([db.engine, db.read_engine])
+		ctx = BenchContext(client, app, options, codes, option_ids, counter)
+		try:
+			for name in names:
+				before = counter.count if counter else 0
+				result = await SCENARIOS[name](ctx)
+				if counter is not None:
+					result.queries = counter.count - before
+				summaries[name] = result.summary()
+		finally:
+			if counter is not None:
+				counter.close()
+			if app is not None:
+				from app.main import results_hub
+
+				await results_hub.close()
+	return summaries
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+	"""Regressions of ``results`` against ``baseline``: slower p95, lower throughput or more queries per request."""
+	problems: List[str] = []
+	for name, current in results.items():
+		base = baseline.get(name)
+		if not base:
+			continue
+		if base.get("p95_ms") and current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+			problems.append(f"{name}: p95 {current['p95_ms']}ms > baseline {base['p95_ms']}ms")
+		if base.get("throughput_rps") and current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+			problems.append(f"{name}: throughput {current['throughput_rps']}/s < baseline {base['throughput_rps']}/s")
+		if "queries_per_request" in base and "queries_per_request" in current:
+			# query counts are deterministic, so only allow a small absolute slack
+			if current["queries_per_request"] > base["queries_per_request"] * (1 + tolerance) + 0.05:
+				problems.append(f"{name}: {current['queries_per_request']} queries/request > baseline {base['queries_per_request']}")
+	return problems
+
+
+def _print_table(results: Dict[str, Dict[str, float]]) -> None:
+	columns = ["requests", "errors", "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "queries_per_request"]
+	print(f"{'scenario':<16}" + "".join(f"{c:>20}" for c in columns))
+	for name, summary in results.items():
+		print(f"{name:<16}" + "".join(f"{summary.get(c, '-'):>20}" for c in columns))
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+	parser = argparse.ArgumentParser(prog="python -m bench", description="PulsePoll load scenarios")
+	parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="run only these (repeatable)")
+	parser.add_argument("--url", help="benchmark a running server instead of an in-process app")
+	parser.add_argument("--polls", type=int, default=BenchOptions.polls)
+	parser.add_argument("--votes", type=int, default=BenchOptions.votes)
+	parser.add_argument("--requests", type=int, default=BenchOptions.requests)
+	parser.add_argument("--concurrency", type=int, default=BenchOptions.concurrency)
+	parser.add_argument("--subscribers", type=int, default=BenchOptions.subscribers)
+	parser.add_argument("--rounds", type=int, default=BenchOptions.rounds)
+	parser.add_argument("--json", help="also write the results to this file")
+	parser.add_argument("--baseline", help="fail if results regress against this JSON file")
+	parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression (default 0.25)")
+	parser.add_argument("--save-baseline", help="write the results as a new baseline file")
+	args = parser.parse_args(argv)
+
+	if args.url is None:
+		# isolate in-process runs from any local database and sitemap directory
+		workdir = tempfile.mkdtemp(prefix="pulsepoll-bench-")
+		os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+		os.environ.setdefault("SITEMAP_DIR", os.path.join(workdir, "sitemaps"))
+	options = BenchOptions(args.polls, args.votes, args.requests, args.concurrency, args.subscribers, args.rounds)
+	names = args.scenario or list(SCENARIOS)
+	results = asyncio.run(run_scenarios(names, options, args.url))
+	_print_table(results)
+	for path in (args.json, args.save_baseline):
+		if path:
+			with open(path, "w", encoding="utf-8") as fh:
+				json.dump(results, fh, indent=2, sort_keys=True)
+	if args.baseline:
+		with open(args.baseline, encoding="utf-8") as fh:
+			problems = compare(results, json.load(fh), args.tolerance)
+		for problem in problems:
+			print(f"REGRESSION {problem}", file=sys.stderr)
+		return 1 if problems else 0
+	return 0
@@ -0,0 +1,14 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+_DB_DIR = tempfile.mkdtemp(prefix="pulsepoll-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_DB_DIR}/test.db")
+os.environ.setdefault("SITEMAP_DIR", f"{_DB_DIR}/sitemaps")
+os.environ.setdefault("EXPORT_HASH_SALT", "test-export-secret")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.db import init_db  # noqa: E402
+
+init_db()
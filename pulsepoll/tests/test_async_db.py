@@ -0,0 +1,54 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.db import async_database_url
+from app.main import create_app
+
+
+def test_async_database_url_swaps_driver():
+	assert async_database_url("sqlite:///./x.db") == "sqlite+aiosqlite:///./x.db"
+	assert async_database_url("postgresql+psycopg2://u@h/db") == "postgresql+asyncpg://u@h/db"
+
+
+def test_async_mode_serves_reads_and_votes():
+	with TestClient(create_app(db_mode="async")) as client:
+		code = client.post("/api/polls", json={"question": "Async?", "options": ["Yes", "No"]}).json()["code"]
+		poll = client.get(f"/api/polls/{code}").json()
+		assert [o["text"] for o in poll["options"]] == ["Yes", "No"]
+		yes, no = (o["id"] for o in poll["options"])
+
+		voted = client.post(f"/api/polls/{code}/vote", json={"option_id": yes}).json()
+		assert voted["status"] == "ok" and voted["results"]["total"] == 1
+		resp = client.post(f"/p/{code}/vote", data={"option_id": no}, follow_redirects=False)
+		assert resp.status_code == 303
+
+		results = client.get(f"/p/{code}/results")
+		counts = {o["id"]: o["count"] for o in results.json()["options"]}
+		# the same voter cookie changed its vote from Yes to No
+		assert counts == {yes: 0, no: 1}
+		assert client.get(f"/p/{code}/results", headers={"If-None-Match": results.headers["etag"]}).status_code == 304
+		assert client.get("/api/polls/missing").status_code == 404
+
+
+def test_async_votes_check_the_rate_limiter_off_the_event_loop(monkeypatch):
+	from app import main
+
+	on_loop = []
+	allow = main.rate_limiter.allow
+
+	def recording_allow(*args, **kwargs):
+		try:
+			asyncio.get_running_loop()
+			on_loop.append(True)
+		except RuntimeError:
+			on_loop.append(False)
+		return allow(*args, **kwargs)
+
+	monkeypatch.setattr(main.rate_limiter, "allow", recording_allow)
+	with TestClient(create_app(db_mode="async")) as client:
+		code = client.post("/api/polls", json={"question": "Loop?", "options": ["Yes", "No"]}).json()["code"]
+		yes = client.get(f"/api/polls/{code}").json()["options"][0]["id"]
+		assert client.post(f"/api/polls/{code}/vote", json={"option_id": yes}).status_code == 200
+		assert client.post(f"/p/{code}/vote", data={"option_id": yes}, follow_redirects=False).status_code == 303
+	assert on_loop and not any(on_loop)
@@ -0,0 +1,84 @@
+import json
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app import counters
+from app.db import engine
+from app.main import create_app
+
+
+client = TestClient(create_app())
+
+
+def test_batch_votes_report_per_record_status():
+	code = client.post("/api/polls", json={"question": "Kiosk?", "options": ["Red", "Blue"]}).json()["code"]
+	red, blue = [o["id"] for o in client.get(f"/api/polls/{code}").json()["options"]]
+
+	batch = [
+		{"code": code, "option_id": red, "voter_id": "k1", "client_ts": "2024-05-01T10:00:00Z", "idempotency_key": "a"},
+		{"code": code, "option_id": red, "voter_id": "k1", "client_ts": "2024-05-01T10:00:00Z", "idempotency_key": "a"},
+		{"code": code, "option_id": blue, "voter_id": "k2", "client_ts": 1714557600, "idempotency_key": "b"},
+		{"code": code, "option_id": red, "voter_id": "k2", "client_ts": 1714557000, "idempotency_key": "c"},
+		{"code": "nope", "option_id": red, "voter_id": "k3", "idempotency_key": "d"},
+		{"code": code, "option_id": 999999, "voter_id": "k3", "idempotency_key": "e"},
+		{"code": code, "voter_id": "k3"},
+	]
+	resp = client.post("/api/votes:batch", json={"votes": batch})
+	assert resp.status_code == 200, resp.text
+	statuses = [r["status"] for r in resp.json()["results"]]
+	assert statuses == ["created", "duplicate", "created", "superseded", "not_found", "invalid_option", "invalid"]
+
+	retry = client.post("/api/votes:batch", json={"votes": batch[:1] + [
+		{"code": code, "option_id": red, "voter_id": "k2", "client_ts": 1714558000, "idempotency_key": "f"},
+	]})
+	assert [r["status"] for r in retry.json()["results"]] == ["unchanged", "updated"]
+
+	results = client.get(f"/p/{code}/results").json()
+	assert {o["text"]: o["count"] for o in results["options"]} == {"Red": 2, "Blue": 0}
+	with Session(engine) as session:
+		assert counters.verify(session) == []
+
+
+
+def test_unparseable_numbers_only_invalidate_their_record():
+	code = client.post("/api/polls", json={"question": "Overflow?", "options": ["A", "B"]}).json()["code"]
+	a = client.get(f"/api/polls/{code}").json()["options"][0]["id"]
+	# json.dumps writes float("inf") as the bare literal Infinity, which the server's JSON parser accepts
+	body = json.dumps({"votes": [
+		{"code": code, "option_id": a, "voter_id": "o1", "client_ts": 1e20},
+		{"code": code, "option_id": a, "voter_id": "o2", "client_ts": 10**30},
+		{"code": code, "option_id": float("inf"), "voter_id": "o3"},
+		{"code": code, "option_id": a, "voter_id": "o4", "client_ts": True},
+		{"code": code, "option_id": True, "voter_id": "o5"},
+		{"code": code, "option_id": a, "voter_id": "o6"},
+	]})
+	resp = client.post("/api/votes:batch", content=body, headers={"content-type": "application/json"})
+	assert resp.status_code == 200, resp.text
+	assert [r["status"] for r in resp.json()["results"]] == ["invalid"] * 5 + ["created"]
+
+
+def test_replayed_offline_batch_does_not_revert_a_newer_vote():
+	code = client.post("/api/polls", json={"question": "Replay?", "options": ["Old", "New"]}).json()["code"]
+	old, new = [o["id"] for o in client.get(f"/api/polls/{code}").json()["options"]]
+	offline = [{"code": code, "option_id": old, "voter_id": "kiosk-7", "client_ts": "2024-05-01T10:00:00Z", "idempotency_key": "x1"}]
+	assert client.post("/api/votes:batch", json={"votes": offline}).json()["results"][0]["status"] == "created"
+	online = [{"code": code, "option_id": new, "voter_id": "kiosk-7"}]
+	assert client.post("/api/votes:batch", json={"votes": online}).json()["results"][0]["status"] == "updated"
+
+	replay = client.post("/api/votes:batch", json={"votes": offline}).json()
+	assert replay["results"][0]["status"] == "superseded"
+	results = client.get(f"/p/{code}/results").json()
+	assert {o["text"]: o["count"] for o in results["options"]} == {"Old": 0, "New": 1}
+
+
+def test_batch_rate_limit_counts_records():
+	from app import main
+
+	code = client.post("/api/polls", json={"question": "Flood?", "options": ["A", "B"]}).json()["code"]
+	a = client.get(f"/api/polls/{code}").json()["options"][0]["id"]
+	headers = {"x-forwarded-for": "198.51.100.99"}
+	batch = [{"code": code, "option_id": a, "voter_id": f"f{i}"} for i in range(main.VOTE_BATCH_MAX)]
+	for _ in range(main.VOTE_BATCH_RECORDS_PER_MINUTE // main.VOTE_BATCH_MAX):
+		assert client.post("/api/votes:batch", json={"votes": batch}, headers=headers).status_code == 200
+	assert client.post("/api/votes:batch", json={"votes": batch[:1]}, headers=headers).status_code == 429
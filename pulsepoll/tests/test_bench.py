@@ -0,0 +1,26 @@
+import pytest
+
+from bench.runner import BenchOptions, compare, percentile, run_scenarios
+
+
+def test_percentile_nearest_rank():
+	assert percentile([], 95) == 0.0
+	assert percentile(list(range(1, 101)), 50) == 50
+	assert percentile(list(range(1, 101)), 99) == 99
+
+
+def test_compare_flags_regressions_only():
+	base = {"results_polling": {"p95_ms": 10.0, "throughput_rps": 100.0, "queries_per_request": 1.0}}
+	assert compare({"results_polling": {"p95_ms": 11.0, "throughput_rps": 90.0, "queries_per_request": 1.0}}, base, 0.25) == []
+	problems = compare({"results_polling": {"p95_ms": 20.0, "throughput_rps": 50.0, "queries_per_request": 2.0}}, base, 0.25)
+	assert len(problems) == 3
+
+
+@pytest.mark.asyncio
+async def test_scenarios_run_in_process():
+	options = BenchOptions(polls=5, votes=50, requests=20, concurrency=4, subscribers=3, rounds=2)
+	results = await run_scenarios(["results_polling", "sse_fanout"], options)
+	assert results["results_polling"]["requests"] == 20
+	assert results["results_polling"]["errors"] == 0
+	assert results["sse_fanout"]["requests"] == 6
+	assert results["results_polling"]["queries_per_request"] > 0
@@ -0,0 +1,44 @@
+import time
+
+from sqlmodel import Session
+
+from app.cache import LRUCache, PollCache
+from app.db import engine
+from app.models import Option, Poll
+
+
+def test_lru_cache_evicts_least_recent_and_expires():
+	cache = LRUCache(maxsize=2, ttl=0.05)
+	cache.set("a", 1)
+	cache.set("b", 2)
+	assert cache.get("a") == 1
+	cache.set("c", 3)
+	assert cache.get("b") is None
+	assert cache.get("a") == 1
+	time.sleep(0.06)
+	assert cache.get("c") is None
+	stats = cache.stats()
+	assert stats["evictions"] == 1
+	assert stats["hits"] == 2 and stats["misses"] == 2
+
+
+def test_poll_cache_hydrates_snapshot_once():
+	with Session(engine) as session:
+		poll = Poll(code="cache01", question="Cached?")
+		session.add(poll)
+		session.flush()
+		session.add_all([Option(poll_id=poll.id, text="Yes"), Option(poll_id=poll.id, text="No")])
+		session.commit()
+
+		cache = PollCache(maxsize=10)
+		first = cache.get(session, "cache01")
+		assert first.question == "Cached?"
+		assert [o.text for o in first.options] == ["Yes", "No"]
+		assert first.has_option(first.options[0].id)
+		assert cache.get(session, "cache01") is first
+		assert cache.get_by_id(session, first.id) is first
+		assert cache.get(session, "missing") is None
+		assert cache.stats()["hits"] == 2
+
+		cache.invalidate("cache01")
+		assert cache.get(session, "cache01") is not first
@@ -0,0 +1,75 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+from app import counters
+from app.db import engine
+from app.main import create_app, short_codes
+from app.models import Option
+from app.polls import NewPoll, create_polls
+
+
+client = TestClient(create_app())
+
+
+def test_counters_follow_vote_changes_and_verify_clean():
+	code = client.post("/api/polls", json={"question": "Tea or coffee?", "options": ["Tea", "Coffee"]}).json()["code"]
+	tea, coffee = [o["id"] for o in client.get(f"/api/polls/{code}").json()["options"]]
+
+	client.post(f"/api/polls/{code}/vote", json={"option_id": tea})
+	client.post(f"/api/polls/{code}/vote", json={"option_id": coffee})
+	other = TestClient(create_app())
+	other.post(f"/api/polls/{code}/vote", json={"option_id": coffee})
+
+	results = client.get(f"/p/{code}/results").json()
+	assert {o["text"]: o["count"] for o in results["options"]} == {"Tea": 0, "Coffee": 2}
+	assert results["total"] == 2
+
+	with Session(engine) as session:
+		assert counters.verify(session) == []
+		counters.rebuild(session)
+		session.commit()
+		assert counters.verify(session) == []
+
+
+def test_results_version_drives_etag_and_short_circuits_304():
+	code = client.post("/api/polls", json={"question": "Versioned?", "options": ["Y", "N"]}).json()["code"]
+	yes, no = [o["id"] for o in client.get(f"/api/polls/{code}").json()["options"]]
+
+	first = client.get(f"/p/{code}/results")
+	assert first.json()["version"] == 0
+	etag = first.headers["ETag"]
+	assert not etag.startswith("W/")
+
+	client.post(f"/api/polls/{code}/vote", json={"option_id": yes})
+	second = client.get(f"/p/{code}/results", headers={"If-None-Match": etag})
+	assert second.status_code == 200
+	assert second.json()["version"] == 1
+	assert second.headers["ETag"] != etag
+
+	# re-voting for the same option changes nothing, so the version stays put
+	client.post(f"/api/polls/{code}/vote", json={"option_id": yes})
+	assert client.get(f"/p/{code}/results", headers={"If-None-Match": second.headers["ETag"]}).status_code == 304
+	client.post(f"/api/polls/{code}/vote", json={"option_id": no})
+	assert client.get(f"/p/{code}/results").json()["version"] == 2
+
+
+def test_counter_and_version_rows_are_upserted_in_one_statement():
+	# an UPDATE followed by an INSERT when nothing matched lets two concurrent first votes collide on Postgres
+	statements = []
+
+	def record(conn, cursor, statement, parameters, context, executemany):
+		if "optioncount" in statement.lower() or "resultsversion" in statement.lower():
+			statements.append(" ".join(statement.split()).upper())
+
+	with Session(engine) as session:
+		((poll_id, _),) = create_polls(session, [NewPoll("Upsert?", ("A", "B"))], short_codes)
+		a, b = session.exec(select(Option.id).where(Option.poll_id == poll_id).order_by(Option.id)).all()
+		event.listen(session.connection(), "before_cursor_execute", record)
+		counters.record_vote(session, poll_id, a)
+		counters.record_vote(session, poll_id, b, previous_option_id=a)
+		session.commit()
+		assert counters.get_counts(session, poll_id) == {a: 0, b: 1}
+		assert counters.get_version(session, poll_id) == 2
+	assert len(statements) == 5
+	assert all(s.startswith("INSERT") and "ON CONFLICT" in s for s in statements)
@@ -0,0 +1,46 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from app.main import create_app
+
+
+client = TestClient(create_app())
+
+
+def test_raw_vote_export_streams_csv_and_jsonl():
+	code = client.post("/api/polls", json={"question": "Export?", "options": ["A", "B"]}).json()["code"]
+	a, b = [o["id"] for o in client.get(f"/api/polls/{code}").json()["options"]]
+	batch = [{"code": code, "option_id": a if i % 3 else b, "voter_id": f"v{i}"} for i in range(30)]
+	client.post("/api/votes:batch", json={"votes": batch})
+
+	csv_resp = client.get(f"/p/{code}/votes.csv")
+	assert csv_resp.status_code == 200
+	lines = csv_resp.text.strip().splitlines()
+	assert lines[0] == "vote_id,option_id,option_text,voter_hash,created_at"
+	assert len(lines) == 31
+	assert "v1," not in csv_resp.text
+
+	jsonl = client.get(f"/p/{code}/votes.jsonl")
+	assert jsonl.headers["content-type"].startswith("application/x-ndjson")
+	rows = [json.loads(line) for line in jsonl.text.splitlines()]
+	assert len(rows) == 30
+	assert sum(r["option_text"] == "B" for r in rows) == 10
+
+	assert client.get(f"/p/{code}/votes.xml").status_code == 404
+
+
+def test_voter_hashes_differ_per_poll_and_need_a_secret(monkeypatch):
+	from app import main
+
+	hashes = []
+	for question in ("First?", "Second?"):
+		code = client.post("/api/polls", json={"question": question, "options": ["A", "B"]}).json()["code"]
+		option_id = client.get(f"/api/polls/{code}").json()["options"][0]["id"]
+		client.post(f"/api/polls/{code}/vote", json={"option_id": option_id})
+		hashes.append(json.loads(client.get(f"/p/{code}/votes.jsonl").text)["voter_hash"])
+	# the same browser must not be linkable across polls
+	assert hashes[0] != hashes[1]
+
+	monkeypatch.setattr(main, "EXPORT_HASH_SALT", None)
+	assert client.get(f"/p/{code}/votes.csv").status_code == 503
@@ -0,0 +1,50 @@
+from fastapi.testclient import TestClient
+
+from app.main import create_app, fragment_cache
+
+
+def _create(client, question):
+	resp = client.post("/api/polls", json={"question": question, "options": ["A", "B"]})
+	code = resp.json()["code"]
+	return code, client.get(f"/api/polls/{code}").json()["options"]
+
+
+def test_poll_page_is_rendered_once_and_vote_state_spliced_in():
+	client = TestClient(create_app())
+	code, options = _create(client, "Fragment?")
+	first = client.get(f"/p/{code}?utm_source=x")
+	hits = fragment_cache.stats()["hits"]
+	second = client.get(f"/p/{code}")
+	# the page and its results block
+	assert fragment_cache.stats()["hits"] == hits + 2
+	assert second.text == first.text
+	assert "utm_source" not in second.text
+	assert 'render;dur=0.0' in second.headers["server-timing"]
+
+	client.post(f"/api/polls/{code}/vote", json={"option_id": options[1]["id"]})
+	page = client.get(f"/p/{code}").text
+	assert f'value="{options[1]["id"]}" checked' in page
+	assert f'value="{options[0]["id"]}" checked' not in page
+	assert "checked" not in TestClient(client.app).get(f"/p/{code}").text
+
+
+def test_votes_rerender_only_the_results_block():
+	client = TestClient(create_app())
+	code, options = _create(client, "Hot poll?")
+	client.get(f"/p/{code}")
+	client.get(f"/e/{code}")
+	client.post(f"/api/polls/{code}/vote", json={"option_id": options[0]["id"]})
+	hits = fragment_cache.stats()["hits"]
+	page = client.get(f"/p/{code}")
+	embed = client.get(f"/e/{code}")
+	# both cached pages are reused; only their results blocks are new
+	assert fragment_cache.stats()["hits"] == hits + 2
+	assert "A - 1 (100%)" in page.text and "A - 1 (100%)" in embed.text
+	assert "<!-- results" not in page.text + embed.text
+
+
+def test_new_polls_show_up_on_listings():
+	client = TestClient(create_app())
+	client.get("/trending")
+	code, _ = _create(client, "Fresh listing?")
+	assert code in client.get("/trending").text
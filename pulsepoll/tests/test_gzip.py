@@ -0,0 +1,39 @@
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.middleware import SelectiveGZipMiddleware
+
+
+def _app():
+	app = FastAPI()
+
+	@app.get("/p/{code}/events")
+	def events(code: str):
+		def stream():
+			for n in range(3):
+				yield f"id: {n}\ndata: {'x' * 400}\n\n"
+		return StreamingResponse(stream(), media_type="text/event-stream")
+
+	@app.get("/text")
+	def text():
+		return PlainTextResponse("y" * 2000)
+
+	app.add_middleware(SelectiveGZipMiddleware, minimum_size=500)
+	return app
+
+
+def test_event_streams_are_not_gzipped():
+	client = TestClient(_app())
+	with client.stream("GET", "/p/abc/events", headers={"accept-encoding": "gzip"}) as resp:
+		assert "content-encoding" not in resp.headers
+		assert resp.headers["content-type"].startswith("text/event-stream")
+		body = b"".join(resp.iter_raw())
+	assert body.startswith(b"id: 0\ndata: ")
+	assert body.count(b"\n\n") == 3
+
+
+def test_other_responses_are_still_gzipped():
+	resp = TestClient(_app()).get("/text", headers={"accept-encoding": "gzip"})
+	assert resp.headers["content-encoding"] == "gzip"
+	assert resp.text == "y" * 2000
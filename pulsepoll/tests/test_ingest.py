@@ -0,0 +1,39 @@
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app import counters, main
+from app.db import engine
+from app.ingest import VoteIngestQueue
+
+
+def test_queued_votes_are_group_committed(monkeypatch):
+	committed = []
+	queue = VoteIngestQueue(engine, max_batch=50, max_delay=0.05, on_commit=committed.append)
+	monkeypatch.setattr(main, "vote_ingest", queue)
+	client = TestClient(main.create_app())
+
+	code = client.post("/api/polls", json={"question": "Queue?", "options": ["Yes", "No"]}).json()["code"]
+	yes, no = [o["id"] for o in client.get(f"/api/polls/{code}").json()["options"]]
+
+	resp = client.post(f"/api/polls/{code}/vote", json={"option_id": yes})
+	assert resp.status_code == 202
+	assert resp.json()["status"] == "queued"
+	for _ in range(5):
+		TestClient(main.create_app()).post(f"/api/polls/{code}/vote", json={"option_id": no})
+	queue.stop()
+
+	assert queue.depth == 0
+	assert queue.stats()["written"] == 6
+	assert queue.stats()["batches"] < 6
+	assert committed
+	with Session(engine) as session:
+		poll_id = committed[0][0].poll_id
+		assert counters.get_counts(session, poll_id) == {yes: 1, no: 5}
+
+
+def test_full_queue_applies_backpressure(monkeypatch):
+	queue = VoteIngestQueue(engine, max_depth=1)
+	monkeypatch.setattr(queue, "start", lambda: None)
+	assert queue.submit(1, 1, "a")
+	assert not queue.submit(1, 1, "b")
+	assert queue.stats()["rejected"] == 1
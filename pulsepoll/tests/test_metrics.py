@@ -0,0 +1,35 @@
+from fastapi.testclient import TestClient
+
+from app import metrics
+from app.main import create_app
+
+
+def test_histogram_renders_cumulative_buckets():
+	hist = metrics.Histogram("t_seconds", "test", ("route",), buckets=(0.1, 1.0))
+	for value in (0.05, 0.5, 5.0):
+		hist.observe(value, route="/x")
+	lines = hist.render()
+	assert 't_seconds_bucket{route="/x",le="0.1"} 1' in lines
+	assert 't_seconds_bucket{route="/x",le="1"} 2' in lines
+	assert 't_seconds_bucket{route="/x",le="+Inf"} 3' in lines
+	assert 't_seconds_count{route="/x"} 3' in lines
+
+
+def test_metrics_endpoint_labels_requests_by_route_template():
+	client = TestClient(create_app())
+	code = client.post("/api/polls", json={"question": "Metrics?", "options": ["A", "B"]}).json()["code"]
+	before = metrics.http_requests.value(method="GET", route="/p/{code}/results", status="200")
+	client.get(f"/p/{code}/results")
+	client.get("/p/missing/results")
+	assert metrics.http_requests.value(method="GET", route="/p/{code}/results", status="200") == before + 1
+
+	resp = client.get("/metrics")
+	assert resp.status_code == 200
+	assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+	body = resp.text
+	assert 'pulsepoll_http_request_duration_seconds_bucket{method="GET",route="/p/{code}/results",le="+Inf"}' in body
+	assert f"/p/{code}/results" not in body
+	assert 'pulsepoll_db_queries_total{engine="primary"}' in body
+	assert 'pulsepoll_cache_hit_ratio{cache="poll_snapshot"}' in body
+	assert "pulsepoll_rate_limit_rejections_total" in body
+	assert "pulsepoll_sse_connections 0" in body
@@ -0,0 +1,70 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import Session
+
+from app.db import engine
+from app.main import create_app, short_codes
+from app.polls import NewPoll, create_polls
+
+
+def test_create_polls_uses_one_insert_per_table():
+	statements = []
+
+	def record(conn, cursor, statement, parameters, context, executemany):
+		# the allocator may create its sequence row first; only poll and option writes count
+		words = statement.split()
+		if words[0].upper() == "INSERT" and words[2].strip('"').lower() in ("poll", "option"):
+			statements.append(statement)
+
+	event.listen(engine, "before_cursor_execute", record)
+	try:
+		with Session(engine) as session:
+			created = create_polls(
+				session,
+				[NewPoll("Q1", ("a", "b")), NewPoll("Q2", ("c", "d", "e")), NewPoll("Q3", ("f", "g"))],
+				short_codes,
+			)
+	finally:
+		event.remove(engine, "before_cursor_execute", record)
+	assert len({code for _, code in created}) == 3
+	# polls in one batched INSERT, options in one more; nothing committed in between
+	assert len(statements) == 2
+
+
+def test_batch_endpoint_reports_each_poll():
+	client = TestClient(create_app())
+	resp = client.post("/api/polls:batch", json={"polls": [
+		{"question": "Tea or coffee?", "options": ["Tea", "Coffee"]},
+		{"question": "", "options": ["x", "y"]},
+		{"question": "Best season?", "options": ["Spring", "Summer", "Fall", "Winter"], "locale": "zh-TW"},
+	]})
+	assert resp.status_code == 200
+	body = resp.json()
+	assert body["created"] == 2
+	assert [r["status"] for r in body["results"]] == ["created", "invalid", "created"]
+	code = body["results"][2]["code"]
+	assert len(client.get(f"/api/polls/{code}").json()["options"]) == 4
+	assert client.post("/api/polls:batch", json={"polls": []}).status_code == 400
+
+
+def test_short_code_collisions_become_503(monkeypatch):
+	client = TestClient(create_app())
+	taken = client.post("/api/polls", json={"question": "First?", "options": ["A", "B"]}).json()["code"]
+	monkeypatch.setattr(short_codes, "allocate", lambda: taken)
+	single = client.post("/api/polls", json={"question": "Again?", "options": ["A", "B"]})
+	batch = client.post("/api/polls:batch", json={"polls": [{"question": "Again?", "options": ["A", "B"]}]})
+	for resp in (single, batch):
+		assert resp.status_code == 503
+		assert resp.json()["detail"] == "codes_unavailable"
+		assert resp.headers["retry-after"] == "1"
+
+
+def test_batch_rate_limit_counts_polls():
+	from app import main
+
+	client = TestClient(create_app())
+	headers = {"X-Forwarded-For": "198.51.100.23"}
+	batch = [{"question": f"Q{i}?", "options": ["A", "B"]} for i in range(main.POLL_BATCH_MAX)]
+	for _ in range(main.POLL_BATCH_POLLS_PER_HOUR // main.POLL_BATCH_MAX):
+		assert client.post("/api/polls:batch", json={"polls": batch}, headers=headers).status_code == 200
+	assert client.post("/api/polls:batch", json={"polls": batch[:1]}, headers=headers).status_code == 429
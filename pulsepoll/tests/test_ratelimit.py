@@ -0,0 +1,88 @@
+from app import utils
+from app.ratelimit import build_rate_limiter
+from app.utils import SlidingWindowRateLimiter
+
+
+class _Clock:
+	def __init__(self, now):
+		self.now = now
+
+	def time(self):
+		return self.now
+
+
+def test_sliding_window_blocks_boundary_bursts(monkeypatch):
+	clock = _Clock(1000.0)
+	monkeypatch.setattr(utils.time, "time", clock.time)
+	limiter = SlidingWindowRateLimiter()
+	assert all(limiter.allow("k", limit=10, window_seconds=60) for _ in range(10))
+	assert not limiter.allow("k", limit=10, window_seconds=60)
+	# just past the fixed-window boundary most of the previous window still counts
+	clock.now = 1021.0
+	assert limiter.allow("k", limit=10, window_seconds=60)
+	assert not limiter.allow("k", limit=10, window_seconds=60)
+	clock.now = 1080.0 + 30.0
+	assert limiter.allow("k", limit=10, window_seconds=60)
+	assert limiter.stats()["rejected"] == 2
+
+
+def test_keys_are_evicted_when_expired_or_over_capacity(monkeypatch):
+	clock = _Clock(1000.0)
+	monkeypatch.setattr(utils.time, "time", clock.time)
+	limiter = SlidingWindowRateLimiter(max_keys=3)
+	for i in range(5):
+		limiter.allow(f"ip:{i}", limit=5, window_seconds=60)
+	assert len(limiter) == 3
+	assert limiter.stats()["evicted_capacity"] == 2
+
+	clock.now += 500
+	limiter.allow("fresh", limit=5, window_seconds=60)
+	stats = limiter.stats()
+	assert stats["keys"] == 1
+	assert stats["evicted_expired"] == 3
+
+
+def test_long_window_keys_do_not_block_or_lose_to_short_ones(monkeypatch):
+	clock = _Clock(1000.0)
+	monkeypatch.setattr(utils.time, "time", clock.time)
+	limiter = SlidingWindowRateLimiter(max_keys=50)
+	assert limiter.allow("create:ip", limit=1, window_seconds=3600)
+	for i in range(40):
+		limiter.allow(f"vote:{i}:ip", limit=5, window_seconds=60)
+
+	# expired vote keys behind the older, still-live create key are swept
+	clock.now += 600
+	for _ in range(10):
+		limiter.allow("vote:new:ip", limit=100, window_seconds=60)
+	assert limiter.stats()["evicted_expired"] == 40
+	assert not limiter.allow("create:ip", limit=1, window_seconds=3600)
+
+	# at capacity, live short-window keys go before a long window that is still counting
+	for i in range(60):
+		limiter.allow(f"vote:{i}:other", limit=5, window_seconds=60)
+	assert limiter.stats()["evicted_capacity"] > 0
+	assert not limiter.allow("create:ip", limit=1, window_seconds=3600)
+
+
+def test_sqlite_backend_shares_counters_between_instances(tmp_path):
+	path = str(tmp_path / "limits.db")
+	worker_a = build_rate_limiter("sqlite", path)
+	worker_b = build_rate_limiter("sqlite", path)
+	assert worker_a.allow("vote:1:ip", limit=3, window_seconds=60)
+	assert worker_b.allow("vote:1:ip", limit=3, window_seconds=60)
+	assert worker_a.allow("vote:1:ip", limit=3, window_seconds=60)
+	assert not worker_b.allow("vote:1:ip", limit=3, window_seconds=60)
+	assert len(worker_a) == 1
+
+
+def test_memory_backend_is_the_default(monkeypatch):
+	monkeypatch.delenv("RATE_LIMIT_BACKEND", raising=False)
+	assert isinstance(build_rate_limiter(), SlidingWindowRateLimiter)
+
+
+def test_cost_counts_several_requests_at_once(tmp_path):
+	for limiter in (SlidingWindowRateLimiter(), build_rate_limiter("sqlite", str(tmp_path / "cost.db"))):
+		assert limiter.allow("batch", limit=10, window_seconds=60, cost=6)
+		assert not limiter.allow("batch", limit=10, window_seconds=60, cost=5)
+		assert limiter.allow("batch", limit=10, window_seconds=60, cost=4)
+		assert not limiter.allow("batch", limit=10, window_seconds=60)
@@ -0,0 +1,161 @@
+import asyncio
+import json
+
+import pytest
+
+from app.realtime import BufferedDelta, ResultsHub, ResultsUpdate, replay_since
+
+
+@pytest.mark.asyncio
+async def test_hub_loads_once_per_tick_for_all_subscribers():
+	calls = []
+	state = {"total": 0}
+
+	def loader(poll_id):
+		calls.append(poll_id)
+		return dict(state)
+
+	hub = ResultsHub(loader, interval=0.05, queue_size=2)
+	async with hub.subscribe(1) as q1, hub.subscribe(1) as q2:
+		assert (await asyncio.wait_for(q1.get(), 1))["total"] == 0
+		assert (await asyncio.wait_for(q2.get(), 1))["total"] == 0
+		state["total"] = 3
+		hub.notify(1)
+		assert (await asyncio.wait_for(q1.get(), 1))["total"] == 3
+		assert (await asyncio.wait_for(q2.get(), 1))["total"] == 3
+		assert hub.subscriber_count(1) == 2
+	# one shared loader per tick, not one per subscriber
+	assert len(calls) < 10
+	await asyncio.sleep(0.1)
+	assert hub.subscriber_count() == 0
+	await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_hub_queue_is_bounded_and_keeps_latest():
+	counter = {"n": 0}
+
+	def loader(poll_id):
+		counter["n"] += 1
+		return counter["n"]
+
+	hub = ResultsHub(loader, interval=0.01, queue_size=2)
+	async with hub.subscribe(7) as queue:
+		await asyncio.sleep(0.2)
+		assert queue.qsize() <= 2
+		first = queue.get_nowait()
+		second = queue.get_nowait()
+		assert second > first
+	await hub.close()
+
+
+def test_results_update_encodes_only_changed_options():
+	before = {"version": 1, "total": 1, "options": [{"id": 1, "text": "a", "count": 1}, {"id": 2, "text": "b", "count": 0}]}
+	after = {"version": 2, "total": 2, "options": [{"id": 1, "text": "a", "count": 1}, {"id": 2, "text": "b", "count": 1}]}
+	update = ResultsUpdate(before, after)
+	assert json.loads(update.delta_message()) == {"type": "delta", "seq": 2, "prev": 1, "total": 2, "changes": [[2, 1]]}
+	assert update.delta_message() is update.delta_message()
+	assert ResultsUpdate(None, after).delta_message() is None
+	assert json.loads(update.snapshot_message())["options"][1]["count"] == 1
+
+
+def test_websocket_sends_snapshot_then_deltas():
+	from fastapi.testclient import TestClient
+	from app.main import create_app
+
+	client = TestClient(create_app())
+	res = client.post("/api/polls", json={"question": "WS?", "options": ["A", "B", "C"]})
+	code = res.json()["code"]
+	options = client.get(f"/api/polls/{code}").json()["options"]
+	with client.websocket_connect(f"/ws/p/{code}") as ws:
+		snapshot = ws.receive_json()
+		assert snapshot["type"] == "snapshot" and snapshot["total"] == 0
+		assert len(snapshot["options"]) == 3
+		client.post(f"/api/polls/{code}/vote", json={"option_id": options[1]["id"]})
+		delta = ws.receive_json()
+		assert delta["type"] == "delta"
+		assert delta["prev"] == snapshot["seq"] and delta["seq"] > snapshot["seq"]
+		assert delta["changes"] == [[options[1]["id"], 1]]
+		assert delta["total"] == 1
+
+	with pytest.raises(Exception):
+		with client.websocket_connect("/ws/p/missing") as ws:
+			ws.receive_json()
+
+
+@pytest.mark.asyncio
+async def test_history_lets_reconnects_replay_only_missed_deltas():
+	state = {"version": 1, "total": 1, "options": [{"id": 1, "text": "a", "count": 1}]}
+
+	def loader(poll_id):
+		return {**state, "options": [dict(o) for o in state["options"]]}
+
+	hub = ResultsHub(loader, interval=0.05, wrap=ResultsUpdate, history_size=4, compact=ResultsUpdate.buffered)
+	async with hub.subscribe(3) as queue:
+		first = await asyncio.wait_for(queue.get(), 1)
+		assert first.message_for(None) == first.snapshot_message()
+		for n in (2, 3):
+			state.update(version=n, total=n, options=[{"id": 1, "text": "a", "count": n}])
+			hub.notify(3)
+			await asyncio.wait_for(queue.get(), 1)
+	await asyncio.sleep(0.1)
+
+	# the channel is gone but its updates survive for resuming clients
+	missed = replay_since(hub.history(3), 1)
+	assert [u.version for u in missed] == [2, 3]
+	assert json.loads(missed[0].delta_message())["changes"] == [[1, 2]]
+	assert replay_since(hub.history(3), 3) == []
+	assert replay_since(hub.history(3), 0) is None
+
+	# only versions and encoded deltas are buffered, not payloads
+	assert all(isinstance(u, BufferedDelta) for u in hub.history(3))
+
+	# a new channel continues the chain, so a caught-up client is sent nothing
+	async with hub.subscribe(3) as queue:
+		update = await asyncio.wait_for(queue.get(), 1)
+		assert update.message_for(3) is None
+		assert update.message_for(None) is not None
+	# and its unchanged first load does not push real deltas out of the buffer
+	assert [u.version for u in hub.history(3)] == [1, 2, 3]
+	await hub.close()
+
+
+def test_page_renders_results_and_live_updates_continue_from_its_version():
+	import re
+	from fastapi.testclient import TestClient
+	from app.main import create_app
+
+	client = TestClient(create_app())
+	code = client.post("/api/polls", json={"question": "SSR?", "options": ["A", "B"]}).json()["code"]
+	options = client.get(f"/api/polls/{code}").json()["options"]
+	client.post(f"/api/polls/{code}/vote", json={"option_id": options[0]["id"]})
+	page = client.get(f"/p/{code}").text
+	assert "A - 1 (100%)" in page
+	state = json.loads(re.search(r'<script type="application/json" id="results-data">(.*?)</script>', page).group(1))
+	version = state["results"]["version"]
+	assert state["etag"].endswith('.%d"' % version)
+
+	with client.websocket_connect(f"/ws/p/{code}?since={version}") as ws:
+		TestClient(client.app).post(f"/api/polls/{code}/vote", json={"option_id": options[1]["id"]})
+		delta = ws.receive_json()
+		assert delta["type"] == "delta" and delta["prev"] == version
+		assert delta["total"] == 2
+
+
+@pytest.mark.asyncio
+async def test_hub_pump_survives_a_failing_loader(caplog):
+	calls = {"n": 0}
+
+	def loader(poll_id):
+		calls["n"] += 1
+		if calls["n"] == 1:
+			raise RuntimeError("database is locked")
+		return {"total": calls["n"]}
+
+	hub = ResultsHub(loader, interval=0.02, max_backoff=0.05)
+	async with hub.subscribe(1) as queue:
+		assert (await asyncio.wait_for(queue.get(), 1))["total"] == 2
+		hub.notify(1)
+		assert (await asyncio.wait_for(queue.get(), 1))["total"] == 3
+	assert "loading results for poll 1 failed" in caplog.text
+	await hub.close()
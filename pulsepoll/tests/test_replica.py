@@ -0,0 +1,65 @@
+import sqlite3
+
+from fastapi.testclient import TestClient
+from sqlmodel import SQLModel
+
+from app import db, main
+from app.main import create_app
+
+
+def test_reads_use_replica_except_right_after_a_write(tmp_path, monkeypatch):
+	replica_path = tmp_path / "replica.db"
+	replica = db._create_engine(f"sqlite:///{replica_path}")
+	SQLModel.metadata.create_all(replica)
+	monkeypatch.setattr(db, "read_engine", replica)
+
+	writer = TestClient(create_app())
+	reader = TestClient(create_app())
+	code = writer.post("/api/polls", json={"question": "Replica?", "options": ["A", "B"]}).json()["code"]
+	assert writer.cookies.get("recent_write")
+
+	# the replica has not caught up: only the writer, routed to the primary, sees the poll
+	assert reader.get(f"/api/polls/{code}").status_code == 404
+	option_id = writer.get(f"/api/polls/{code}").json()["options"][0]["id"]
+	writer.post(f"/api/polls/{code}/vote", json={"option_id": option_id})
+	assert writer.get(f"/p/{code}/results").json()["total"] == 1
+	assert reader.get(f"/p/{code}/results").json()["total"] == 0
+
+	# once the replica has the data, everyone reads it from there
+	primary = sqlite3.connect(db.DATABASE_URL.split("///", 1)[1])
+	with sqlite3.connect(replica_path) as target:
+		primary.backup(target)
+	primary.close()
+	replica.dispose()
+	writer.cookies.delete("recent_write")
+	assert writer.get(f"/p/{code}/results").json()["total"] == 1
+	assert reader.get(f"/p/{code}/results").json()["total"] == 1
+
+
+def test_async_replica_reads_do_not_share_the_primary_results_version(tmp_path, monkeypatch):
+	replica_path = tmp_path / "replica-async.db"
+	replica = db._create_engine(f"sqlite:///{replica_path}")
+	SQLModel.metadata.create_all(replica)
+	replica.dispose()
+	monkeypatch.setattr(db, "DATABASE_REPLICA_URL", f"sqlite:///{replica_path}")
+
+	with TestClient(create_app(db_mode="async")) as writer, TestClient(create_app(db_mode="async")) as reader:
+		code = writer.post("/api/polls", json={"question": "Async replica?", "options": ["A", "B"]}).json()["code"]
+		primary = sqlite3.connect(db.DATABASE_URL.split("///", 1)[1])
+		with sqlite3.connect(replica_path) as target:
+			primary.backup(target)
+		option_id = writer.get(f"/api/polls/{code}").json()["options"][0]["id"]
+		# caches the primary's version 1; the replica still has version 0
+		assert writer.post(f"/api/polls/{code}/vote", json={"option_id": option_id}).json()["results"]["total"] == 1
+
+		stale = reader.get(f"/p/{code}/results")
+		assert stale.json()["total"] == 0
+		assert stale.headers["etag"].endswith('.0"')
+
+		with sqlite3.connect(replica_path) as target:
+			primary.backup(target)
+		primary.close()
+		main.results_versions.clear()
+		fresh = reader.get(f"/p/{code}/results", headers={"If-None-Match": stale.headers["etag"]})
+		assert fresh.status_code == 200
+		assert fresh.json()["total"] == 1
@@ -0,0 +1,49 @@
+import json
+import re
+
+from fastapi.testclient import TestClient
+
+from app.main import create_app
+
+
+def test_html_gets_security_headers_and_lang_cookie():
+	client = TestClient(create_app())
+	resp = client.get("/", headers={"Accept-Language": "zh-TW,zh;q=0.9"})
+	assert resp.headers["x-frame-options"] == "DENY"
+	assert "frame-ancestors 'none'" in resp.headers["content-security-policy"]
+	assert "strict-transport-security" not in resp.headers
+	assert resp.cookies.get("lang") == "zh-TW"
+
+	resp = client.get("/", cookies={"lang": "en"})
+	assert "set-cookie" not in resp.headers
+
+
+def test_json_and_static_skip_lang_cookie():
+	client = TestClient(create_app())
+	for path in ("/health", "/static/logo.svg"):
+		resp = client.get(path)
+		assert resp.headers["x-content-type-options"] == "nosniff"
+		assert "lang" not in resp.cookies
+
+
+def test_embed_keeps_its_own_frame_policy_and_https_adds_hsts():
+	client = TestClient(create_app(), base_url="https://testserver")
+	code = client.post("/api/polls", json={"question": "Embed?", "options": ["A", "B"]}).json()["code"]
+	resp = client.get(f"/e/{code}")
+	assert resp.headers["x-frame-options"] == "ALLOWALL"
+	assert "frame-ancestors *" in resp.headers["content-security-policy"]
+	assert resp.headers.get_list("content-security-policy") == [resp.headers["content-security-policy"]]
+	assert resp.headers["strict-transport-security"].startswith("max-age=")
+
+
+def test_embed_runs_no_inline_script():
+	client = TestClient(create_app())
+	code = client.post("/api/polls", json={"question": "Inline?", "options": ["A", "B"]}).json()["code"]
+	resp = client.get(f"/e/{code}")
+	assert "'unsafe-inline'" not in resp.headers["content-security-policy"].split("script-src", 1)[1].split(";")[0]
+	# every script is either loaded from an allowed origin or an inert JSON data block
+	for tag in re.findall(r"<script[^>]*>", resp.text):
+		assert 'src="' in tag or 'type="application/json"' in tag
+	data = json.loads(re.search(r'<script type="application/json" id="results-data">(.*?)</script>', resp.text).group(1))
+	assert f'data-poll="{code}"' in resp.text and data["results"]["total"] == 0
+	assert client.get("/static/embed.js").status_code == 200
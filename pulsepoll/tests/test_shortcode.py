@@ -0,0 +1,27 @@
+import pytest
+
+from app.db import engine
+from app.shortcode import FeistelPermutation, ShortCodeAllocator
+
+
+def test_feistel_permutation_is_a_bijection_with_inverse():
+	perm = FeistelPermutation(b"k", 1000)
+	images = [perm.forward(n) for n in range(1000)]
+	assert sorted(images) == list(range(1000))
+	assert all(perm.inverse(perm.forward(n)) == n for n in range(1000))
+	assert images != list(range(1000))
+	assert [FeistelPermutation(b"other", 1000).forward(n) for n in range(1000)] != images
+	with pytest.raises(ValueError):
+		perm.forward(1000)
+
+
+def test_allocators_share_the_sequence_without_collisions():
+	first = ShortCodeAllocator(engine, key="test-key", block_size=10)
+	second = ShortCodeAllocator(engine, key="test-key", block_size=10)
+	codes = [a.allocate() for _ in range(25) for a in (first, second)]
+	assert len(set(codes)) == len(codes)
+	assert all(len(code) == 7 for code in codes)
+	# codes decode back to the reserved ids, and each worker drew from its own blocks
+	ids = [first.id_for(code) for code in codes]
+	assert len(set(ids)) == len(ids)
+	assert first.id_for("not-a-code") is None
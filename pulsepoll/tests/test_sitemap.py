@@ -0,0 +1,60 @@
+import gzip
+import time
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app import main
+from app.db import engine
+from app.polls import NewPoll, create_polls
+from app.sitemap import SitemapStore
+
+
+def test_sitemap_index_and_shards_support_revalidation(monkeypatch, tmp_path):
+	store = SitemapStore(engine, str(tmp_path), "https://pulsepoll.example", shard_size=2, debounce=0)
+	monkeypatch.setattr(main, "sitemap_store", store)
+	client = TestClient(main.create_app())
+	codes = [client.post("/api/polls", json={"question": f"Q{i}", "options": ["a", "b"]}).json()["code"] for i in range(3)]
+	store.flush()
+
+	index = client.get("/sitemap.xml")
+	assert index.status_code == 200
+	assert "/sitemaps/pages.xml.gz" in index.text
+	assert index.text.count("<sitemap>") == 1 + store.shard_count()
+	assert client.get("/sitemap.xml", headers={"If-None-Match": index.headers["etag"]}).status_code == 304
+
+	last = store.shard_count() - 1
+	shard = client.get(f"/sitemaps/{last}.xml.gz")
+	assert shard.status_code == 200
+	assert shard.headers["content-type"] == "application/gzip"
+	assert "content-encoding" not in shard.headers
+	body = gzip.decompress(shard.content).decode()
+	assert f"<loc>https://pulsepoll.example/p/{codes[-1]}</loc>" in body
+	assert body.count("<url>") <= 2
+	assert client.get(f"/sitemaps/{last}.xml.gz", headers={"If-None-Match": shard.headers["etag"]}).status_code == 304
+	assert client.get(f"/sitemaps/{last}.xml.gz", headers={"If-Modified-Since": shard.headers["last-modified"]}).status_code == 304
+	assert client.get(f"/sitemaps/{last + 5}.xml.gz").status_code == 404
+
+
+def test_request_host_never_reaches_the_sitemap(monkeypatch, tmp_path):
+	store = SitemapStore(engine, str(tmp_path), "https://pulsepoll.example/", shard_size=2, debounce=0)
+	monkeypatch.setattr(main, "sitemap_store", store)
+	client = TestClient(main.create_app())
+	with Session(engine) as session:
+		create_polls(session, [NewPoll("Host?", ("a", "b"))], main.short_codes)
+	store.start()
+	deadline = time.monotonic() + 5
+	while not (tmp_path / "base_url").exists() and time.monotonic() < deadline:
+		time.sleep(0.01)
+	assert (tmp_path / "base_url").read_text() == "https://pulsepoll.example"
+	assert (tmp_path / "pages.xml.gz").exists()
+	written = {p.name: p.stat().st_mtime_ns for p in tmp_path.glob("*.xml.gz")}
+
+	index = client.get("/sitemap.xml", headers={"Host": "evil.example"})
+	assert "evil.example" not in index.text
+	assert "<loc>https://pulsepoll.example/sitemaps/pages.xml.gz</loc>" in index.text
+	last = store.shard_count() - 1
+	shard = client.get(f"/sitemaps/{last}.xml.gz", headers={"Host": "evil.example"})
+	assert b"evil.example" not in gzip.decompress(shard.content)
+	# serving the sitemap never rewrites shards
+	assert {p.name: p.stat().st_mtime_ns for p in tmp_path.glob("*.xml.gz")} == written
@@ -0,0 +1,42 @@
+import logging
+import re
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.main import create_app
+from app.middleware import ServerTimingMiddleware
+
+
+def _timings(header):
+	return {m.group(1): m for m in re.finditer(r'(\w+);dur=([\d.]+)(?:;desc="(\d+) queries")?', header)}
+
+
+def test_server_timing_reports_queries_and_render():
+	client = TestClient(create_app())
+	code = client.post("/api/polls", json={"question": "Timing?", "options": ["A", "B"]}).json()["code"]
+	resp = client.get(f"/p/{code}")
+	parts = _timings(resp.headers["server-timing"])
+	assert set(parts) == {"db", "render", "app"}
+	assert int(parts["db"].group(3)) > 0
+	assert float(parts["render"].group(2)) > 0
+
+
+def test_server_timing_counts_async_queries():
+	with TestClient(create_app(db_mode="async")) as client:
+		code = client.post("/api/polls", json={"question": "Async timing?", "options": ["A", "B"]}).json()["code"]
+		resp = client.get(f"/api/polls/{code}")
+	assert int(_timings(resp.headers["server-timing"])["db"].group(3)) > 0
+
+
+def test_query_heavy_requests_are_logged(caplog):
+	app = FastAPI()
+
+	@app.get("/n/{item}")
+	def handler(item: str):
+		return {}
+
+	app.add_middleware(ServerTimingMiddleware, max_queries=-1)
+	with caplog.at_level(logging.WARNING, logger="app.middleware"):
+		TestClient(app).get("/n/1")
+	assert "query-heavy request GET /n/{item} -> 200" in caplog.text
@@ -0,0 +1,30 @@
+from app.trending import TrendingIndex
+
+
+def test_recent_votes_outrank_older_bursts():
+	index = TrendingIndex(half_life_seconds=600, capacity=3)
+	now = index._landmark
+	for _ in range(10):
+		index.record(1, at=now - 3600)
+	for _ in range(3):
+		index.record(2, at=now)
+	index.record(3, at=now)
+	assert [poll_id for poll_id, _ in index.top(3)] == [2, 3, 1]
+	assert index.window_count(1, now=now) == 10
+
+
+def test_top_k_is_bounded_and_rebase_prunes_idle_polls():
+	index = TrendingIndex(window_seconds=3600, bucket_seconds=60, half_life_seconds=600, capacity=2)
+	now = index._landmark
+	index.record(1, at=now)
+	index.record(2, at=now)
+	index.record(2, at=now)
+	index.record(3, at=now + 1)
+	index.record(3, at=now + 1)
+	index.record(3, at=now + 1)
+	assert [poll_id for poll_id, _ in index.top(5)] == [3, 2]
+
+	later = now + 2 * 3600
+	index.record(4, at=later)
+	assert len(index) == 1
+	assert [poll_id for poll_id, _ in index.top(5)] == [4]
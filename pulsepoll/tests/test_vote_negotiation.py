@@ -0,0 +1,34 @@
+from fastapi.testclient import TestClient
+
+from app.main import create_app
+
+
+def _poll(client):
+	code = client.post("/api/polls", json={"question": "Negotiate?", "options": ["A", "B"]}).json()["code"]
+	return code, [o["id"] for o in client.get(f"/api/polls/{code}").json()["options"]]
+
+
+def test_form_vote_redirect_keeps_voter_cookie():
+	client = TestClient(create_app())
+	code, (a, b) = _poll(client)
+	resp = client.post(f"/p/{code}/vote", data={"option_id": a}, headers={"Accept": "text/html"}, follow_redirects=False)
+	assert resp.status_code == 303 and resp.headers["location"] == f"/p/{code}"
+	assert resp.cookies.get("voter_id")
+
+	# the cookie came back, so the second vote replaces the first instead of adding a voter
+	client.post(f"/p/{code}/vote", data={"option_id": b}, headers={"Accept": "text/html"}, follow_redirects=False)
+	counts = {o["id"]: o["count"] for o in client.get(f"/p/{code}/results").json()["options"]}
+	assert counts == {a: 0, b: 1}
+
+
+def test_fetch_vote_returns_tally_without_rendering_the_page():
+	client = TestClient(create_app())
+	code, (a, _) = _poll(client)
+	resp = client.post(f"/p/{code}/vote", data={"option_id": a}, headers={"Accept": "application/json"})
+	assert resp.status_code == 200
+	assert resp.cookies.get("voter_id")
+	body = resp.json()
+	assert body["status"] == "ok"
+	assert body["results"]["total"] == 1
+	assert "render;dur=0.0" in resp.headers["server-timing"]
+	assert client.get(f"/p/{code}/results", headers={"If-None-Match": resp.headers["etag"]}).status_code == 304
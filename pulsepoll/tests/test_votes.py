@@ -0,0 +1,97 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+
+from app import counters, votes
+from app.db import engine
+from app.models import Option, Poll, Vote
+
+
+def _make_poll(session, code, texts=("A", "B")):
+	poll = Poll(code=code, question="Pick one")
+	session.add(poll)
+	session.flush()
+	opts = [Option(poll_id=poll.id, text=t) for t in texts]
+	session.add_all(opts)
+	session.commit()
+	return poll.id, [o.id for o in opts]
+
+
+def test_cast_vote_upserts_and_reports_outcome():
+	with Session(engine) as session:
+		poll_id, (a, b) = _make_poll(session, "upsert1")
+
+		first = votes.cast_vote(session, poll_id, a, "voter-1")
+		session.commit()
+		assert first.created and first.changed
+
+		same = votes.cast_vote(session, poll_id, a, "voter-1")
+		session.commit()
+		assert not same.created and not same.changed
+
+		moved = votes.cast_vote(session, poll_id, b, "voter-1")
+		session.commit()
+		assert moved.changed and moved.previous_option_id == a
+
+		assert counters.get_counts(session, poll_id) == {a: 0, b: 1}
+		assert counters.verify(session, poll_id) == []
+
+
+def test_duplicate_vote_rows_are_rejected_by_the_database():
+	with Session(engine) as session:
+		poll_id, (a, _) = _make_poll(session, "upsert2")
+		session.add(Vote(poll_id=poll_id, option_id=a, voter_id="dup"))
+		session.commit()
+		session.add(Vote(poll_id=poll_id, option_id=a, voter_id="dup"))
+		with pytest.raises(IntegrityError):
+			session.commit()
+
+
+def _before_vote_update(session, action):
+	"""Run ``action`` once, right before ``session`` sends its first ``UPDATE vote``."""
+	state = {"done": False}
+
+	def hook(conn, cursor, statement, parameters, context, executemany):
+		if not state["done"] and statement.startswith("UPDATE vote"):
+			state["done"] = True
+			action()
+
+	event.listen(session.connection(), "before_cursor_execute", hook)
+
+
+def _move_in_other_session(poll_id, option_id, voter_id):
+	with Session(engine) as other:
+		votes.cast_vote(other, poll_id, option_id, voter_id)
+		other.commit()
+
+
+def test_concurrent_vote_changes_move_the_counters_once():
+	with Session(engine) as session:
+		poll_id, (a, b, c) = _make_poll(session, "race1", ("A", "B", "C"))
+		votes.cast_vote(session, poll_id, a, "racer")
+		session.commit()
+
+	with Session(engine) as session:
+		# the other request moves A -> C after this one has read A but before it writes
+		_before_vote_update(session, lambda: _move_in_other_session(poll_id, c, "racer"))
+		outcome = votes.cast_vote(session, poll_id, b, "racer")
+		session.commit()
+		assert outcome.previous_option_id == c
+		assert counters.get_counts(session, poll_id) == {a: 0, b: 1, c: 0}
+		assert counters.verify(session, poll_id) == []
+
+
+def test_batch_vote_change_racing_a_single_vote_keeps_counters_exact():
+	with Session(engine) as session:
+		poll_id, (a, b, c) = _make_poll(session, "race2", ("A", "B", "C"))
+		votes.cast_vote(session, poll_id, a, "racer")
+		session.commit()
+
+	with Session(engine) as session:
+		_before_vote_update(session, lambda: _move_in_other_session(poll_id, c, "racer"))
+		statuses, _ = votes.cast_votes_batch(session, [votes.BatchVote("race2", b, "racer")])
+		session.commit()
+		assert statuses == ["updated"]
+		assert counters.get_counts(session, poll_id) == {a: 0, b: 1, c: 0}
+		assert counters.verify(session, poll_id) == []